@@ -0,0 +1 @@
+"""Offline benchmarks running text2cast against local provider stubs."""
@@ -0,0 +1,221 @@
+"""Measure pipeline throughput against the local provider stubs.
+
+Examples::
+
+    python -m benchmarks.run tts --engine volcengine --entries 300
+    python -m benchmarks.run tts --engine minimax --throttle 0.05 --runs 2
+    python -m benchmarks.run script_v2 --articles 40 --json result.json
+
+Each run reports wall time, segments per second, stub requests and
+throttled responses, the time spent in ffmpeg and the peak RSS of the
+process. Runs after the first reuse the segment
+cache of the first one. The exit status is non-zero if a run failed, so the
+command can gate CI.
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import List
+
+from text2cast import config as cfg_module
+from text2cast import mp3, trace
+from text2cast.config import Config
+from text2cast.script import write_script
+
+from .stubs import StubServer, StubSettings
+from .synthetic import make_input_v2, make_script
+
+MODELS = {"openai": "tts-1", "volcengine": "volcano_tts", "minimax": "speech-02-hd"}
+VOICES = {
+    "openai": {"1": "alloy", "2": "echo"},
+    "volcengine": {"1": "zh_female_stub", "2": "zh_male_stub"},
+    "minimax": {"1": "female-stub", "2": "male-stub"},
+}
+
+
+def _make_config(workdir: str, args: argparse.Namespace) -> Config:
+    effects = {}
+    for name in ("intro", "transition", "article_end", "outro"):
+        path = os.path.join(workdir, f"{name}.mp3")
+        with open(path, "wb") as f:
+            f.write(mp3.silence(1.0, 44100, 2, 128))
+        effects[name] = path
+    return Config(
+        model_summary="stub-chat",
+        model_script="stub-chat",
+        tts_model=MODELS[args.engine],
+        input_path=os.path.join(workdir, "inputv2.json"),
+        brief_path=os.path.join(workdir, "brief.txt"),
+        script_path=os.path.join(workdir, f"script.{args.script_format}"),
+        audio_dir=os.path.join(workdir, "audio"),
+        speaker_voice=VOICES[args.engine],
+        sound_effects=effects,
+        tts_engine=args.engine,
+        chat_engine="openai",
+        max_concurrency=args.max_concurrency,
+        cache_dir=os.path.join(workdir, "cache"),
+        coalesce_chars=args.coalesce_chars,
+        engine_format=args.engine_format,
+        progressive=args.progressive,
+    )
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS. Children are not
+    # counted: a forked child reports the parent's pages as its own.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _run_once(scenario: str, cfg: Config, server: StubServer, number: int, units: int) -> dict:
+    from text2cast.script_v2 import urls_to_script
+    from text2cast.tts import PROGRESSIVE_DIR, script_to_audio
+
+    before = dict(server.stats.requests), server.stats.throttled
+    trace.enable()
+    start = time.perf_counter()
+    wall_start = time.time()
+    error = None
+    try:
+        if scenario == "tts":
+            script_to_audio(cfg, strict=True)
+        else:
+            urls_to_script(cfg)
+    except Exception as e:
+        logging.getLogger(__name__).error("Run %d failed: %s", number, e)
+        error = str(e)
+    seconds = time.perf_counter() - start
+
+    rows = trace.summarize()
+    requests = {
+        route: count - before[0].get(route, 0)
+        for route, count in server.stats.requests.items()
+        if count - before[0].get(route, 0)
+    }
+    result = {
+        "scenario": scenario,
+        "run": number,
+        "ok": error is None,
+        "error": error,
+        "seconds": round(seconds, 3),
+        "units": units,
+        "units_per_second": round(units / seconds, 2) if seconds else 0.0,
+        "requests": requests,
+        "throttled": server.stats.throttled - before[1],
+        "ffmpeg_seconds": round(sum(r["total"] for r in rows if r["category"] == "ffmpeg"), 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    if cfg.progressive:
+        # Seconds until a player of the progressive playlist could start.
+        first = os.path.join(cfg.audio_dir, PROGRESSIVE_DIR, "chunk_00000.mp3")
+        if os.path.exists(first):
+            result["first_chunk_seconds"] = round(os.path.getmtime(first) - wall_start, 3)
+    return result
+
+
+def _format(results: List[dict]) -> str:
+    unit = "segments/s" if results and results[0]["scenario"] == "tts" else "articles/s"
+    progressive = any("first_chunk_seconds" in r for r in results)
+    lines = [
+        f"{'run':>3}  {'status':<6} {'seconds':>8} {unit:>11} {'requests':>8} "
+        f"{'429s':>5} {'ffmpeg s':>8} {'rss MB':>7}"
+        + (f" {'first chunk s':>13}" if progressive else "")
+    ]
+    for r in results:
+        lines.append(
+            f"{r['run']:>3}  {'ok' if r['ok'] else 'FAILED':<6} {r['seconds']:>8.2f} "
+            f"{r['units_per_second']:>11.2f} {sum(r['requests'].values()):>8} "
+            f"{r['throttled']:>5} {r['ffmpeg_seconds']:>8.2f} {r['peak_rss_mb']:>7.1f}"
+            + (f" {r.get('first_chunk_seconds', 0.0):>13.2f}" if progressive else "")
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline text2cast benchmarks")
+    parser.add_argument("scenario", choices=["tts", "script_v2"])
+    parser.add_argument("--engine", choices=sorted(MODELS), default="volcengine")
+    parser.add_argument("--entries", type=int, default=200, help="Script entries (tts)")
+    parser.add_argument("--long_chars", type=int, default=800, help="Length of monologues (tts)")
+    parser.add_argument("--articles", type=int, default=20, help="Articles (script_v2)")
+    parser.add_argument("--max_concurrency", type=int, default=8)
+    parser.add_argument("--coalesce_chars", type=int, default=12)
+    parser.add_argument(
+        "--engine_format",
+        choices=["auto", "default", "mp3", "pcm"],
+        default="auto",
+        help="Audio requested from the engine (tts)",
+    )
+    parser.add_argument(
+        "--script_format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="Format of the synthetic script (tts)",
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Publish the HLS playlist while rendering and time its first chunk (tts)",
+    )
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--throttle", type=float, default=0.0, help="Share of rate-limited responses")
+    parser.add_argument("--retry_after", type=float, default=0.2)
+    parser.add_argument("--chunk_bytes", type=int, default=16384)
+    parser.add_argument("--chunk_delay", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep inputs and outputs here instead of a temp dir")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    settings = StubSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle=args.throttle,
+        retry_after=args.retry_after,
+        chunk_bytes=args.chunk_bytes,
+        chunk_delay=args.chunk_delay,
+        seed=args.seed,
+    )
+    with StubServer(settings) as server, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(server.env())
+        cfg_module.load_env_vars()
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        cfg = _make_config(workdir, args)
+        if args.scenario == "tts":
+            data = make_script(
+                args.entries,
+                seed=args.seed,
+                long_chars=args.long_chars,
+                sound_effects=list(cfg.sound_effects.values()),
+            )
+            units = sum(1 for e in data if e["type"] == "tts")
+            write_script(cfg.script_path, data)
+        else:
+            data = make_input_v2(args.articles, server.url, seed=args.seed)
+            units = args.articles
+            with open(cfg.input_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+
+        results = [_run_once(args.scenario, cfg, server, n + 1, units) for n in range(args.runs)]
+
+    print(_format(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if not all(r["ok"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
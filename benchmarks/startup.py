@@ -0,0 +1,90 @@
+"""Measure CLI startup and guard against eager imports of heavy SDKs.
+
+Every case runs in a fresh interpreter. The report shows the median wall
+time above a bare ``python -c pass`` and the heavy modules the case loaded::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20 --max_ms 150 --json startup.json
+
+The exit status is non-zero if a case loads a module it must not load or
+is slower than ``--max_ms``.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+HEAVY = ("openai", "firecrawl", "requests", "httpx", "yaml")
+
+# (name, code, modules that must stay unloaded)
+CASES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("import text2cast", "import text2cast", HEAVY),
+    ("import text2cast.cli", "import text2cast.cli", HEAVY),
+    (
+        "text2cast --help",
+        "import sys; sys.argv = ['text2cast', '--help']\n"
+        "from text2cast.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass",
+        HEAVY,
+    ),
+    ("import text2cast.tts", "import text2cast.tts", ("openai", "firecrawl", "requests")),
+]
+
+_REPORT = "\nimport json, sys\nprint(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))"
+
+
+def _time(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _loaded(code: str) -> List[str]:
+    out = subprocess.run(
+        [sys.executable, "-c", code + _REPORT.format(heavy=HEAVY)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(repeat: int, max_ms: Optional[float]) -> Tuple[List[dict], bool]:
+    baseline = statistics.median(_time("pass") for _ in range(repeat))
+    results, ok = [], True
+    for name, code, forbidden in CASES:
+        ms = (statistics.median(_time(code) for _ in range(repeat)) - baseline) * 1000
+        loaded = _loaded(code)
+        bad = [m for m in loaded if m in forbidden]
+        passed = not bad and (max_ms is None or ms <= max_ms)
+        ok = ok and passed
+        results.append({"case": name, "ms": round(ms, 1), "loaded": loaded, "forbidden": bad, "ok": passed})
+    return results, ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="text2cast startup benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max_ms", type=float, help="Fail if a case takes longer")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results, ok = run(max(1, args.repeat), args.max_ms)
+    width = max(len(r["case"]) for r in results)
+    for r in results:
+        status = "ok" if r["ok"] else "FAILED"
+        loaded = ", ".join(r["loaded"]) or "-"
+        print(f"{r['case']:<{width}}  {status:<6} {r['ms']:>7.1f} ms  loaded: {loaded}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
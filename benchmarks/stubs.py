@@ -0,0 +1,455 @@
+"""Local HTTP stubs imitating the providers used by text2cast.
+
+One server answers the OpenAI speech and chat endpoints, Volcengine's
+``/api/v1/tts`` and voice clone endpoints, Minimax's ``/v1/t2a_v2`` and
+Firecrawl's scrape and batch scrape endpoints. Responses are shaped like the real ones (base64 audio in
+Volcengine JSON, hex audio in Minimax JSON, raw bytes from OpenAI) and carry
+valid MP3 frames or raw PCM, in the requested sample rate and channels, whose
+length follows the text, so the whole pipeline including ffmpeg runs against
+them.
+
+Latency, rate limiting and the streaming chunk size are configurable with
+:class:`StubSettings`.
+"""
+
+import base64
+import binascii
+import json
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from text2cast import mp3
+
+# Default profile of the stub audio; Volcengine's default is 24 kHz mono.
+SAMPLE_RATE = 24000
+CHANNELS = 1
+BITRATE = 48
+# MPEG-1 rates need a bitrate from the MPEG-1 table.
+MPEG1_BITRATE = 128
+
+
+@dataclass
+class StubSettings:
+    latency: float = 0.05  # seconds before the first byte
+    jitter: float = 0.02  # added uniformly at random to ``latency``
+    throttle: float = 0.0  # probability of a rate-limit response
+    retry_after: float = 0.2  # ``Retry-After`` seconds sent with HTTP 429
+    seconds_per_char: float = 0.15  # spoken duration of one character
+    chunk_bytes: int = 16384  # size of the streamed body chunks
+    chunk_delay: float = 0.0  # pause between body chunks
+    article_chars: int = 3000  # length of scraped articles
+    training_polls: int = 2  # status polls before a cloned voice is ready
+    seed: Optional[int] = None
+
+
+@dataclass
+class StubStats:
+    requests: Dict[str, int] = field(default_factory=dict)
+    throttled: int = 0
+    bytes_sent: int = 0
+
+
+def _spoken(ch: str) -> bool:
+    return not unicodedata.category(ch).startswith(("P", "Z", "S", "C"))
+
+
+def speech(
+    text: str,
+    seconds_per_char: float,
+    codec: str = "mp3",
+    rate: int = SAMPLE_RATE,
+    channels: int = CHANNELS,
+) -> Tuple[bytes, List[dict], float]:
+    """Return silent audio for ``text``, its word timestamps and duration.
+
+    Every spoken character is one "word" of ``seconds_per_char``; punctuation
+    adds a pause of the same length, like a real voice pausing at commas.
+    ``codec`` is ``mp3`` or ``pcm`` (signed 16-bit little-endian).
+    """
+    words, t = [], 0.0
+    for ch in text:
+        if _spoken(ch):
+            words.append(
+                {"word": ch, "start_time": round(t, 3), "end_time": round(t + seconds_per_char, 3)}
+            )
+        t += seconds_per_char
+    duration = max(t, seconds_per_char)
+    # Rounded up to 0.1 s so repeated lengths share the cached frames.
+    duration = math.ceil(duration * 10) / 10
+    if codec == "pcm":
+        return bytes(round(duration * rate) * 2 * channels), words, duration
+    bitrate = MPEG1_BITRATE if rate >= 32000 else BITRATE
+    return mp3.silence(duration, rate, channels, bitrate), words, duration
+
+
+def article(url: str, chars: int) -> str:
+    """Deterministic markdown standing in for a scraped page."""
+    rng = random.Random(url)
+    sentences = [
+        "The central bank kept rates unchanged this quarter.",
+        "Analysts expect exports to recover in the second half.",
+        "Local officials announced a new transit plan on Monday.",
+        "Shares of chip makers rose after the earnings report.",
+        "The survey covered more than two thousand households.",
+    ]
+    lines = [f"# {url}", ""]
+    size = 0
+    while size < chars:
+        line = " ".join(rng.choice(sentences) for _ in range(4))
+        lines.append(line)
+        size += len(line)
+    return "\n\n".join(lines)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, format, *args):  # noqa: A002 - signature of the base class
+        pass
+
+    # -- helpers ---------------------------------------------------------
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"{}")
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None) -> None:
+        settings = self.server.settings
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for start in range(0, len(body), settings.chunk_bytes):
+            if start and settings.chunk_delay:
+                time.sleep(settings.chunk_delay)
+            self.wfile.write(body[start:start + settings.chunk_bytes])
+        self.server.record_bytes(len(body))
+
+    def _json(self, data: dict, status: int = 200, headers: Optional[dict] = None) -> None:
+        self._send(status, json.dumps(data).encode(), "application/json", headers)
+
+    def _throttle_http(self) -> bool:
+        """Answer with HTTP 429 if this request is picked for throttling."""
+        if not self.server.should_throttle():
+            return False
+        retry = self.server.settings.retry_after
+        self._json(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+            status=429,
+            headers={"Retry-After": f"{retry:g}"},
+        )
+        return True
+
+    # -- routes ----------------------------------------------------------
+
+    def do_HEAD(self):
+        # Article pages; the scrape cache revalidates expired entries.
+        self.server.count("head")
+        etag = '"' + uuid.uuid5(uuid.NAMESPACE_URL, self.path).hex + '"'
+        self.send_response(304 if self.headers.get("If-None-Match") == etag else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        match = re.fullmatch(r"/v[12]/batch/scrape/([\w-]+)", path)
+        if match:
+            self.server.count("firecrawl batch status")
+            urls = self.server.batches.get(match.group(1))
+            if urls is None:
+                self._json({"success": False, "error": "Unknown job"}, status=404)
+                return
+            docs = [self.server.document(url) for url in urls]
+            self._json(
+                {
+                    "success": True,
+                    "status": "completed",
+                    "total": len(docs),
+                    "completed": len(docs),
+                    "creditsUsed": len(docs),
+                    "expiresAt": "2099-01-01T00:00:00Z",
+                    "data": docs,
+                }
+            )
+            return
+        self._json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        routes = {
+            "/v1/audio/speech": self._openai_speech,
+            "/v1/chat/completions": self._chat,
+            "/chat/completions": self._chat,
+            "/api/v1/tts": self._volcengine,
+            "/v1/t2a_v2": self._minimax,
+            "/api/v1/mega_tts/audio/upload": self._clone_upload,
+            "/api/v1/mega_tts/status": self._clone_status,
+            "/v1/scrape": self._scrape,
+            "/v2/scrape": self._scrape,
+            "/v1/batch/scrape": self._batch_scrape,
+            "/v2/batch/scrape": self._batch_scrape,
+        }
+        handler = routes.get(path)
+        if handler is None:
+            self._json({"error": "not found"}, status=404)
+            return
+        body = self._body()
+        self.server.delay()
+        handler(body)
+
+    def _openai_speech(self, body: dict) -> None:
+        self.server.count("openai speech")
+        if self._throttle_http():
+            return
+        # The API returns PCM at 24 kHz mono.
+        codec = "pcm" if body.get("response_format") == "pcm" else "mp3"
+        audio, _, _ = speech(
+            body.get("input", ""), self.server.settings.seconds_per_char, codec
+        )
+        self._send(200, audio, "audio/pcm" if codec == "pcm" else "audio/mpeg")
+
+    def _chat(self, body: dict) -> None:
+        self.server.count("chat")
+        if self._throttle_http():
+            return
+        content = self.server.chat_reply(body)
+        created = int(time.time())
+        if not body.get("stream"):
+            self._json(
+                {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": body.get("model", "stub"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }
+            )
+            return
+        events = []
+        for start in range(0, len(content), 40):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {"index": 0, "delta": {"content": content[start:start + 40]}, "finish_reason": None}
+                ],
+            }
+            events.append(f"data: {json.dumps(chunk)}\n\n")
+        events.append("data: [DONE]\n\n")
+        self._send(200, "".join(events).encode(), "text/event-stream")
+
+    def _volcengine(self, body: dict) -> None:
+        self.server.count("volcengine")
+        if self._throttle_http():
+            return
+        request = body.get("request", {})
+        audio_setting = body.get("audio", {})
+        audio, words, duration = speech(
+            request.get("text", ""),
+            self.server.settings.seconds_per_char,
+            audio_setting.get("encoding", "mp3"),
+            audio_setting.get("rate", SAMPLE_RATE),
+        )
+        reply = {
+            "reqid": request.get("reqid"),
+            "code": 3000,
+            "operation": "query",
+            "message": "Success",
+            "sequence": -1,
+            "data": base64.b64encode(audio).decode(),
+            "addition": {"duration": str(int(duration * 1000))},
+        }
+        if request.get("with_frontend"):
+            reply["addition"]["frontend"] = json.dumps({"words": words})
+        self._json(reply)
+
+    def _minimax(self, body: dict) -> None:
+        self.server.count("minimax")
+        if self.server.should_throttle():
+            # Minimax reports rate limiting inside a 200 response.
+            self._json({"base_resp": {"status_code": 1002, "status_msg": "rate limit"}})
+            return
+        audio_setting = body.get("audio_setting", {})
+        codec = audio_setting.get("format", "mp3")
+        audio, _, duration = speech(
+            body.get("text", ""),
+            self.server.settings.seconds_per_char,
+            codec,
+            audio_setting.get("sample_rate", 32000),
+            audio_setting.get("channel", 1),
+        )
+        self._json(
+            {
+                "data": {"audio": binascii.hexlify(audio).decode(), "status": 2},
+                "extra_info": {"audio_length": int(duration * 1000), "audio_format": codec},
+                "trace_id": uuid.uuid4().hex,
+                "base_resp": {"status_code": 0, "status_msg": "success"},
+            }
+        )
+
+    def _clone_upload(self, body: dict) -> None:
+        self.server.count("volcengine clone upload")
+        if self._throttle_http():
+            return
+        for audio in body.get("audios", []):
+            base64.b64decode(audio["audio_bytes"], validate=True)
+        with self.server._lock:
+            self.server.voices[body["speaker_id"]] = 0
+        self._json({"BaseResp": {"StatusCode": 0, "StatusMessage": ""}, "speaker_id": body["speaker_id"]})
+
+    def _clone_status(self, body: dict) -> None:
+        self.server.count("volcengine clone status")
+        speaker = body.get("speaker_id")
+        with self.server._lock:
+            polls = self.server.voices.get(speaker)
+            if polls is not None:
+                self.server.voices[speaker] = polls + 1
+        if polls is None:
+            status = 0
+        else:
+            status = 2 if polls >= self.server.settings.training_polls else 1
+        self._json(
+            {
+                "BaseResp": {"StatusCode": 0, "StatusMessage": ""},
+                "speaker_id": speaker,
+                "status": status,
+                "create_time": int(time.time() * 1000),
+                "version": "V1",
+            }
+        )
+
+    def _scrape(self, body: dict) -> None:
+        self.server.count("firecrawl scrape")
+        if self._throttle_http():
+            return
+        self._json({"success": True, "data": self.server.document(body.get("url", ""))})
+
+    def _batch_scrape(self, body: dict) -> None:
+        self.server.count("firecrawl batch")
+        if self._throttle_http():
+            return
+        job = uuid.uuid4().hex
+        self.server.batches[job] = list(body.get("urls") or [])
+        self._json({"success": True, "id": job, "url": f"{self.server.url}/v2/batch/scrape/{job}"})
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server; use as a context manager or call :meth:`start`."""
+
+    daemon_threads = True
+
+    def __init__(self, settings: Optional[StubSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.settings = settings or StubSettings()
+        self.stats = StubStats()
+        self.batches: Dict[str, List[str]] = {}
+        # Status polls seen for every uploaded voice.
+        self.voices: Dict[str, int] = {}
+        self._rng = random.Random(self.settings.seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables pointing text2cast at this server."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "stub",
+            "DEEPSEEK_BASE_URL": self.url,
+            "DEEPSEEK_API_KEY": "stub",
+            "VOLCENGINE_TTS_URL": f"{self.url}/api/v1/tts",
+            "VOLCENGINE_CLONE_URL": f"{self.url}/api/v1/mega_tts",
+            "VOLCENGINE_TOKEN": "stub",
+            "VOLCENGINE_APP_ID": "stub",
+            "MINIMAX_TTS_URL": f"{self.url}/v1/t2a_v2",
+            "MINIMAX_API_KEY": "stub",
+            "MINIMAX_GROUP_ID": "stub",
+            "FIRECRAWL_API_URL": self.url,
+            "FIRECRAWL_API_KEY": "fc-stub",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -- used by the handler ---------------------------------------------
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.stats.requests[route] = self.stats.requests.get(route, 0) + 1
+
+    def record_bytes(self, size: int) -> None:
+        with self._lock:
+            self.stats.bytes_sent += size
+
+    def should_throttle(self) -> bool:
+        with self._lock:
+            throttled = self._rng.random() < self.settings.throttle
+            if throttled:
+                self.stats.throttled += 1
+            return throttled
+
+    def delay(self) -> None:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.settings.jitter) if self.settings.jitter else 0.0
+        time.sleep(self.settings.latency + jitter)
+
+    def document(self, url: str) -> dict:
+        markdown = article(url, self.settings.article_chars)
+        return {
+            "markdown": markdown,
+            "metadata": {"sourceURL": url, "url": url, "title": url, "statusCode": 200},
+        }
+
+    @staticmethod
+    def chat_reply(body: dict) -> str:
+        """A short summary, or a script array when the prompt asks for one."""
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        if "JSON" in prompt or "json" in prompt:
+            return json.dumps(
+                [
+                    {"speaker": str(1 + i % 2), "text": f"这是第{i + 1}句测试台词，用于基准测试。", "type": "tts"}
+                    for i in range(8)
+                ],
+                ensure_ascii=False,
+            )
+        return "这是一段用于基准测试的新闻摘要，内容由本地桩服务生成。"
@@ -0,0 +1,122 @@
+"""Generators for synthetic ``script.json`` and ``inputv2.json`` files.
+
+The output is deterministic for a given seed, so runs are comparable::
+
+    python -m benchmarks.synthetic script --entries 500 -o script.json
+    python -m benchmarks.synthetic inputv2 --articles 40 -o inputv2.json
+"""
+
+import argparse
+import json
+import random
+from typing import Dict, List, Optional
+
+_PHRASES = [
+    "今天我们来聊一聊人工智能在医疗领域的应用",
+    "这项研究覆盖了全国二十多个城市",
+    "数据显示，去年第四季度的出口增长明显放缓",
+    "很多听众朋友在后台留言问到这个问题",
+    "从长期来看，这个趋势可能还会持续",
+    "我觉得这里面有两个关键因素值得注意",
+    "当然，也有专家对此持保留意见",
+    "我们先来看一组具体的数字",
+]
+_INTERJECTIONS = ["嗯。", "对。", "是的。", "没错。", "确实。", "哈哈。", "好的。"]
+
+
+def _sentence(rng: random.Random) -> str:
+    return rng.choice(_PHRASES) + rng.choice("。！？，")
+
+
+def _paragraph(rng: random.Random, chars: int) -> str:
+    text = ""
+    while len(text) < chars:
+        text += _sentence(rng)
+    return text
+
+
+def make_script(
+    entries: int,
+    seed: int = 0,
+    short_ratio: float = 0.25,
+    long_ratio: float = 0.05,
+    long_chars: int = 800,
+    effect_every: int = 20,
+    sound_effects: Optional[List[str]] = None,
+) -> List[Dict[str, object]]:
+    """Return a script of ``entries`` entries.
+
+    Most entries are dialogue lines of one to three sentences. About
+    ``short_ratio`` are interjections (candidates for coalescing) and
+    ``long_ratio`` monologues of ``long_chars`` characters (split into
+    several requests). Every ``effect_every`` entries a sound effect or a
+    pause is inserted.
+    """
+    rng = random.Random(seed)
+    effects = sound_effects or []
+    script: List[Dict[str, object]] = []
+    speaker = 1
+    while len(script) < entries:
+        if effect_every and script and len(script) % effect_every == 0:
+            if effects and rng.random() < 0.5:
+                script.append({"type": "sound_effect", "path": rng.choice(effects)})
+            else:
+                script.append({"type": "silent", "duration": 0.5})
+            continue
+        roll = rng.random()
+        if roll < short_ratio:
+            text = rng.choice(_INTERJECTIONS)
+        elif roll < short_ratio + long_ratio:
+            text = _paragraph(rng, long_chars)
+        else:
+            text = "".join(_sentence(rng) for _ in range(rng.randint(1, 3)))
+        # Interjections usually answer the other speaker.
+        if rng.random() < 0.6:
+            speaker = 2 if speaker == 1 else 1
+        script.append({"speaker": str(speaker), "text": text, "type": "tts"})
+    return script
+
+
+def make_input_v2(articles: int, base_url: str, local_ratio: float = 0.3, seed: int = 0) -> Dict[str, list]:
+    """Return an ``inputv2.json`` document with ``articles`` article URLs.
+
+    The URLs point below ``base_url``, usually the stub server, so HEAD
+    requests of the scrape cache stay local.
+    """
+    rng = random.Random(seed)
+    data: Dict[str, list] = {"global": [], "local": []}
+    for i in range(articles):
+        section = "local" if rng.random() < local_ratio else "global"
+        data[section].append(
+            {"title": f"测试新闻标题 {i + 1}", "url": f"{base_url.rstrip('/')}/articles/{i + 1}"}
+        )
+    return data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark inputs")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    script = sub.add_parser("script", help="script.json for the tts step")
+    script.add_argument("--entries", type=int, default=200)
+    script.add_argument("--long_chars", type=int, default=800)
+    script.add_argument("--sound_effect", action="append", default=[], help="Sound effect path (repeatable)")
+    inputv2 = sub.add_parser("inputv2", help="inputv2.json for script_v2")
+    inputv2.add_argument("--articles", type=int, default=20)
+    inputv2.add_argument("--base_url", default="http://127.0.0.1:8000")
+    for p in (script, inputv2):
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    if args.kind == "script":
+        data = make_script(
+            args.entries, seed=args.seed, long_chars=args.long_chars, sound_effects=args.sound_effect
+        )
+    else:
+        data = make_input_v2(args.articles, args.base_url, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
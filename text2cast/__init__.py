@@ -1,21 +1,43 @@
-"""Public API for the Text2Cast package."""
+"""Public API for the Text2Cast package.
 
-from .config import load_config, Config
-from .summarizer import input_to_brief
-from .script_generator import brief_to_script
-from .utils import wash_json
-from .tts import script_to_audio
-from .voice_clone import clone_voice
+The names below are imported on first access, so ``import text2cast`` does
+not load the OpenAI or Firecrawl SDKs until a step that needs them is used.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING
 
 __version__ = "0.1.0"
 
-__all__ = [
-    'load_config',
-    'Config',
-    'input_to_brief',
-    'brief_to_script',
-    'script_to_audio',
-    'clone_voice',
-    'wash_json',
-    '__version__',
-]
+_EXPORTS = {
+    'load_config': '.config',
+    'Config': '.config',
+    'input_to_brief': '.summarizer',
+    'brief_to_script': '.script_generator',
+    'script_to_audio': '.tts',
+    'clone_voice': '.voice_clone',
+    'wash_json': '.utils',
+}
+
+__all__ = list(_EXPORTS) + ['__version__']
+
+if TYPE_CHECKING:
+    from .config import load_config, Config
+    from .summarizer import input_to_brief
+    from .script_generator import brief_to_script
+    from .utils import wash_json
+    from .tts import script_to_audio
+    from .voice_clone import clone_voice
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
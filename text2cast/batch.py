@@ -0,0 +1,192 @@
+"""Run several episodes concurrently in one process.
+
+Episodes share the TTS engines (and their connection pools), the on-disk
+caches and one concurrency budget per provider, so parallel jobs queue for
+the provider instead of tripping its rate limits.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from .config import Config, load_config
+from .engines import TTSEngine, create_engine
+from .pipeline import run_pipeline
+from .ratelimit import get_limiter
+from . import runtime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARALLEL_JOBS = 2
+
+
+@dataclass
+class Job:
+    name: str
+    cfg: Config
+    stream: bool = False
+    force: bool = False
+
+
+@dataclass
+class JobResult:
+    name: str
+    ok: bool
+    seconds: float
+    stages: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchSettings:
+    parallel: int = DEFAULT_PARALLEL_JOBS
+    tts_budgets: Dict[str, int] = field(default_factory=dict)
+    chat_budgets: Dict[str, int] = field(default_factory=dict)
+
+
+def _job_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def load_jobs(
+    paths: List[str], configure: Callable[[Config], Config] = lambda cfg: cfg
+) -> Tuple[List[Job], BatchSettings]:
+    """Load jobs from config files and jobs files.
+
+    A jobs file is a YAML document with a ``jobs`` list whose items are
+    config paths or mappings with ``config`` and optional ``name``,
+    ``stream`` and ``force``. It may also set ``parallel`` and per-provider
+    ``budgets`` for ``tts`` and ``chat``. Any other file is a config for a
+    single job. ``configure`` is applied to every loaded config.
+    """
+    jobs: List[Job] = []
+    settings = BatchSettings()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        if "jobs" not in data:
+            jobs.append(Job(_job_name(path), configure(load_config(path))))
+            continue
+        logger.debug("Loading jobs file %s", path)
+        base = os.path.dirname(path)
+        settings.parallel = int(data.get("parallel", settings.parallel))
+        budgets = data.get("budgets") or {}
+        settings.tts_budgets.update(budgets.get("tts") or {})
+        settings.chat_budgets.update(budgets.get("chat") or {})
+        for item in data["jobs"]:
+            if isinstance(item, str):
+                item = {"config": item}
+            config_path = os.path.join(base, item["config"])
+            jobs.append(
+                Job(
+                    item.get("name") or _job_name(config_path),
+                    configure(load_config(config_path)),
+                    stream=bool(item.get("stream", False)),
+                    force=bool(item.get("force", False)),
+                )
+            )
+    names = [job.name for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job names: {', '.join(duplicates)}")
+    return jobs, settings
+
+
+class SharedResources:
+    """TTS engines shared by all jobs of a batch."""
+
+    def __init__(self, settings: BatchSettings):
+        self.settings = settings
+        self._engines: Dict[Tuple[str, str, str], TTSEngine] = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, jobs: List[Job]) -> None:
+        """Apply the provider budgets of the batch to the rate limiters.
+
+        The limiters are process-wide, so every job talking to a provider
+        shares its budget. Without a budget a limiter keeps the settings of
+        the first job using it.
+        """
+        for job in jobs:
+            for kind, provider, budgets in (
+                ("tts", job.cfg.tts_engine, self.settings.tts_budgets),
+                ("chat", job.cfg.chat_engine, self.settings.chat_budgets),
+            ):
+                limiter = get_limiter(job.cfg, kind, provider)
+                if provider in budgets and limiter.ceiling != budgets[provider]:
+                    logger.info(
+                        "Budget for %s: %d", limiter.name, budgets[provider]
+                    )
+                    limiter.resize(budgets[provider])
+
+    def engine(self, cfg: Config) -> TTSEngine:
+        """Return the engine for ``cfg``, creating it on first use.
+
+        Engines are created lazily so a job with missing credentials fails
+        on its own instead of aborting the batch. The requested output format
+        is engine state (see :func:`tts.negotiate_format`), so jobs only
+        share an engine when they also ask for the same format.
+        """
+        key = (cfg.tts_engine, cfg.tts_model, cfg.engine_format)
+        with self._lock:
+            if key not in self._engines:
+                self._engines[key] = create_engine(cfg)
+            return self._engines[key]
+
+    def close(self) -> None:
+        for engine in self._engines.values():
+            runtime.run(engine.aclose())
+        self._engines.clear()
+
+
+def _run_job(job: Job, shared: SharedResources) -> JobResult:
+    start = time.monotonic()
+    logger.info("Starting job %s", job.name)
+    try:
+        stages = run_pipeline(
+            job.cfg,
+            stream=job.stream,
+            force=job.force,
+            engine=shared.engine(job.cfg),
+        )
+    except Exception as e:
+        logger.error("Job %s failed: %s", job.name, e)
+        return JobResult(job.name, False, time.monotonic() - start, error=str(e))
+    logger.info("Finished job %s", job.name)
+    return JobResult(job.name, True, time.monotonic() - start, stages)
+
+
+def run_batch(jobs: List[Job], settings: BatchSettings) -> List[JobResult]:
+    """Run ``jobs`` with up to ``settings.parallel`` episodes at a time.
+
+    A failing job does not stop the others. Results follow job order.
+    """
+    shared = SharedResources(settings)
+    try:
+        shared.prepare(jobs)
+        with ThreadPoolExecutor(
+            max_workers=max(1, settings.parallel), thread_name_prefix="text2cast-job"
+        ) as pool:
+            return list(pool.map(lambda job: _run_job(job, shared), jobs))
+    finally:
+        shared.close()
+
+
+def format_report(results: List[JobResult]) -> str:
+    """Return a plain-text table with one line per job."""
+    width = max([len(r.name) for r in results] + [3])
+    lines = []
+    for r in results:
+        if r.ok:
+            detail = "stages: " + (", ".join(r.stages) or "up to date")
+        else:
+            detail = f"error: {r.error}"
+        status = "ok" if r.ok else "FAILED"
+        lines.append(f"{r.name:<{width}}  {status:<6}  {r.seconds:7.1f}s  {detail}")
+    return "\n".join(lines)
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .config import Config
+from . import trace
+
+logger = logging.getLogger(__name__)
+
+# Named caches living below ``cfg.cache_dir``.
+CACHE_NAMES = ("segments", "assets", "scrape", "llm")
+
+
+def make_key(**parts) -> str:
+    """Return a stable hex digest for the given key parts."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 of a file, memoized by path, size and mtime."""
+    st = os.stat(path)
+    return _file_digest(os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Content-addressed file store with LRU eviction by total size.
+
+    Entries are plain files named after their key. The modification time of
+    an entry is refreshed on every hit and used as its recency when the
+    cache grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the path of a cached entry, or ``None`` on a miss."""
+        path = self.path_for(key)
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        path = self.path_for(key)
+        tmp = self._tmp_path(path)
+        with trace.span("cache write", "file", bytes=len(data)):
+            with open(tmp, "wb") as f:
+                f.write(data)
+            return self._commit(tmp, path)
+
+    def put_file(self, key: str, src: str) -> str:
+        path = self.path_for(key)
+        tmp = self._tmp_path(path)
+        with trace.span("cache write", "file") as span:
+            shutil.copyfile(src, tmp)
+            span.set(bytes=os.path.getsize(tmp))
+            return self._commit(tmp, path)
+
+    def adopt(self, key: str, src: str) -> str:
+        """Move the file ``src`` into the cache under ``key``."""
+        path = self.path_for(key)
+        tmp = self._tmp_path(path)
+        os.replace(src, tmp)
+        return self._commit(tmp, path)
+
+    def tmp_path(self, key: str) -> str:
+        """Return a scratch path next to the entry for ``key``."""
+        return self._tmp_path(self.path_for(key)) + self.suffix
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """Return ``(path, size, mtime)`` for every entry in the cache."""
+        result = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix) or ".tmp-" in name:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                result.append((path, st.st_size, st.st_mtime))
+        return result
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """Evict least recently used entries until the cache fits.
+
+        Returns the number of removed entries and the bytes freed.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed = freed = 0
+            if limit is not None:
+                for path, size, _ in sorted(entries, key=lambda e: e[2]):
+                    if total <= limit:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+                    freed += size
+            self._size = total
+        if removed:
+            logger.debug(
+                "Evicted %d entries (%d bytes) from %s", removed, freed, self.directory
+            )
+        return removed, freed
+
+    def _tmp_path(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.tmp-{uuid.uuid4().hex}"
+
+    def _commit(self, tmp: str, path: str) -> str:
+        size = os.path.getsize(tmp)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            over = (
+                self.max_bytes is not None
+                and (self._size is None or self._size > self.max_bytes)
+            )
+        if over:
+            self.prune()
+        return path
+
+
+_open_caches: Dict[Tuple[str, str], DiskCache] = {}
+_open_lock = threading.Lock()
+
+
+def open_cache(cfg: Config, name: str, suffix: str = "") -> Optional[DiskCache]:
+    """Return the named cache below ``cfg.cache_dir`` or ``None`` if disabled.
+
+    The size limit comes from ``cfg.cache_limits[name]`` and defaults to
+    ``cfg.cache_max_bytes``.
+
+    The cache object is kept for the life of the process, so its running size
+    total survives between calls and only the first write after startup
+    scans the directory.
+    """
+    if not cfg.cache_dir:
+        return None
+    max_bytes = cfg.cache_limits.get(name, cfg.cache_max_bytes)
+    directory = os.path.join(cfg.cache_dir, name)
+    key = (os.path.abspath(directory), suffix)
+    with _open_lock:
+        cache = _open_caches.get(key)
+        if cache is None:
+            cache = _open_caches[key] = DiskCache(directory, max_bytes, suffix)
+    cache.max_bytes = max_bytes
+    return cache
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Place ``src`` at ``dst`` using a hardlink when possible."""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
@@ -1,16 +1,19 @@
 import argparse
 import logging
+from typing import List, Optional
 
+from .cache import CACHE_NAMES, open_cache
 from .config import load_config, Config
-from .summarizer import input_to_brief
-from .script_generator import brief_to_script
-from .script_v2 import urls_to_script
-from .tts import script_to_audio
-from .voice_clone import clone_voice
+from . import trace
+
+# The steps, engines and their SDKs are imported by the subcommand that
+# needs them, so ``--help`` or a ``tts`` run does not load openai/firecrawl.
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROFILE_PATH = "text2cast-trace.json"
+
 
 def apply_overrides(cfg: Config, args: argparse.Namespace) -> Config:
     """Apply command line overrides to the config object."""
@@ -32,6 +35,14 @@ def apply_overrides(cfg: Config, args: argparse.Namespace) -> Config:
         cfg.script_path = args.script_path
     if args.audio_dir:
         cfg.audio_dir = args.audio_dir
+    if args.max_concurrency:
+        cfg.max_concurrency = args.max_concurrency
+    if args.no_cache:
+        cfg.cache_dir = None
+    if args.refresh_scrape:
+        cfg.refresh_scrape = True
+    if args.progressive:
+        cfg.progressive = True
 
     if args.clone_sample:
         cfg.voice_clone_samples.extend(args.clone_sample)
@@ -51,21 +62,101 @@ def apply_overrides(cfg: Config, args: argparse.Namespace) -> Config:
     return cfg
 
 
-def run_all(cfg: Config) -> None:
-    """Run the full text-to-podcast pipeline."""
+def run_all(cfg: Config, stream: bool = False, force: bool = False) -> None:
+    """Run the full text-to-podcast pipeline.
+
+    Stages whose inputs, settings and prompts are unchanged since their last
+    successful run are skipped; ``force`` runs all of them. With ``stream``
+    the script completion is parsed while it is generated and every finished
+    entry is handed to TTS right away.
+    """
+    from .pipeline import run_pipeline
+
     logger.info("Running full pipeline")
-    input_to_brief(cfg)
-    brief_to_script(cfg)
-    script_to_audio(cfg)
+    run_pipeline(cfg, stream=stream, force=force)
+
+
+def run_batch_command(args: argparse.Namespace) -> bool:
+    """Run every episode listed on the command line; return whether all passed.
+
+    ``args.config`` and ``args.configs`` may be episode configs or jobs
+    files. Command line overrides apply to every episode.
+    """
+    from .batch import format_report, load_jobs, run_batch
+
+    jobs, settings = load_jobs(
+        [args.config] + args.configs, lambda cfg: apply_overrides(cfg, args)
+    )
+    if args.parallel:
+        settings.parallel = args.parallel
+    for job in jobs:
+        job.stream = job.stream or args.stream
+        job.force = job.force or args.force
+    logger.info("Running %d jobs, %d at a time", len(jobs), settings.parallel)
+    results = run_batch(jobs, settings)
+    print(format_report(results))
+    return all(result.ok for result in results)
+
+
+def run_clone(
+    cfg: Config,
+    voices: Optional[List[str]] = None,
+    wait: bool = False,
+    timeout: float = 600.0,
+) -> bool:
+    """Clone the configured voices; return whether all of them succeeded.
+
+    ``voices`` adds voices given as ``name=sample[,sample...]``. With
+    ``wait`` a voice only succeeds once its training finished.
+    """
+    from .voice_clone import READY, clone_voices, status_name
+
+    targets = {name: list(samples) for name, samples in cfg.voice_clone_voices.items()}
+    if cfg.voice_clone_name and cfg.voice_clone_samples:
+        targets[cfg.voice_clone_name] = cfg.voice_clone_samples
+    for item in voices or []:
+        name, sep, samples = item.partition("=")
+        if not sep or not samples:
+            raise ValueError("--voice must be of the form name=sample[,sample...]")
+        targets[name] = samples.split(",")
+    if not targets:
+        raise ValueError("No voices to clone: set voice_clone or pass --voice")
+    logger.info(
+        "Cloning %d voices from %d samples",
+        len(targets),
+        sum(len(samples) for samples in targets.values()),
+    )
+    results = clone_voices(
+        targets, preprocess=cfg.voice_clone_preprocess, wait=wait, timeout=timeout
+    )
+    ok = True
+    for name, result in results.items():
+        if "error" in result:
+            ok = False
+            print(f"{name}\terror: {result['error']}")
+        elif wait:
+            ok = ok and result.get("status") in READY
+            print(f"{name}\t{status_name(result)}")
+        else:
+            print(f"{name}\tuploaded")
+    return ok
 
 
-def run_clone(cfg: Config) -> None:
-    """Run voice cloning using configured samples and name."""
-    if not cfg.voice_clone_samples or not cfg.voice_clone_name:
-        raise ValueError("voice_clone_samples and voice_clone_name must be set")
-    logger.info("Cloning voice %s from %d samples", cfg.voice_clone_name, len(cfg.voice_clone_samples))
-    voice_id = clone_voice(cfg.voice_clone_samples, cfg.voice_clone_name)
-    print(voice_id)
+def run_cache(cfg: Config, action: str, max_bytes=None) -> None:
+    """Report on or prune the on-disk caches."""
+    if not cfg.cache_dir:
+        raise ValueError("cache is disabled")
+    for name in CACHE_NAMES:
+        cache = open_cache(cfg, name)
+        if action == "prune":
+            removed, freed = cache.prune(max_bytes)
+            print(f"{name}: removed {removed} entries, freed {freed} bytes")
+        else:
+            stats = cache.stats()
+            print(
+                f"{name}: {stats['entries']} entries, {stats['bytes']} bytes"
+                f" (limit {stats['max_bytes']})"
+            )
 
 
 def main() -> None:
@@ -81,6 +172,37 @@ def main() -> None:
     parser.add_argument("--brief_path")
     parser.add_argument("--script_path")
     parser.add_argument("--audio_dir")
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        help="Number of script entries synthesized in parallel",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Disable the on-disk caches for this run",
+    )
+    parser.add_argument(
+        "--refresh_scrape",
+        "--refresh-scrape",
+        action="store_true",
+        help="Ignore cached article content and scrape every URL again",
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Publish an HLS playlist of the episode while TTS is running",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_PATH,
+        metavar="PATH",
+        help=(
+            "Record a timing trace (Chrome trace JSON, default "
+            f"{DEFAULT_PROFILE_PATH}) and print a summary at the end"
+        ),
+    )
     parser.add_argument("--clone_name", help="Name for the cloned voice")
     parser.add_argument(
         "--clone_sample",
@@ -100,30 +222,131 @@ def main() -> None:
     sub.add_parser("script")
     sub.add_parser("script_v2")
     sub.add_parser("tts")
-    sub.add_parser("all")
-    sub.add_parser("clone")
+    all_parser = sub.add_parser("all")
+    all_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Start TTS while the script is still being generated",
+    )
+    all_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run every stage even if its outputs are up to date",
+    )
+    batch_parser = sub.add_parser(
+        "batch", help="Run several episodes concurrently in one process"
+    )
+    batch_parser.add_argument(
+        "configs",
+        nargs="*",
+        help="Further episode configs or jobs files",
+    )
+    batch_parser.add_argument(
+        "--parallel", type=int, help="Number of episodes run at the same time"
+    )
+    batch_parser.add_argument("--stream", action="store_true")
+    batch_parser.add_argument("--force", action="store_true")
+    clone_parser = sub.add_parser("clone", help="Clone Volcengine voices from samples")
+    clone_parser.add_argument(
+        "--voice",
+        action="append",
+        metavar="NAME=SAMPLE[,SAMPLE...]",
+        help="Voice to clone, can be used multiple times",
+    )
+    clone_parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="Poll the training status until every voice is ready",
+    )
+    clone_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=600.0,
+        help="Seconds to wait for training with --wait",
+    )
+    clone_parser.add_argument(
+        "--no_preprocess",
+        action="store_true",
+        help="Upload the samples as they are",
+    )
+    cache_parser = sub.add_parser("cache")
+    cache_parser.add_argument("action", choices=["stats", "prune"])
+    cache_parser.add_argument(
+        "--max_bytes",
+        type=int,
+        help="Prune down to this size instead of the configured limit",
+    )
     args, rest = parser.parse_known_args()
     if rest:
         args = parser.parse_args([args.config] + rest, namespace=args)
+    if args.profile:
+        trace.enable()
+    try:
+        with trace.span(args.command or "all", "run"):
+            run_command(args)
+    finally:
+        if args.profile:
+            trace.write(args.profile)
+            print(trace.format_summary())
+            print(f"Trace written to {args.profile}")
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """Run the subcommand selected by ``args``."""
+    if args.command == "batch":
+        ok = run_batch_command(args)
+        _log_cache_counters()
+        if not ok:
+            raise SystemExit(1)
+        return
     cfg = load_config(args.config)
     cfg = apply_overrides(cfg, args)
     if args.command == "summary":
+        from .summarizer import input_to_brief
+
         logger.info("Running summarization step")
         input_to_brief(cfg)
     elif args.command == "script":
+        from .script_generator import brief_to_script
+
         logger.info("Running script generation step")
         brief_to_script(cfg)
     elif args.command == "script_v2":
+        from .script_v2 import urls_to_script
+
         logger.info("Running script_v2 generation step")
         urls_to_script(cfg)
     elif args.command == "tts":
+        from .tts import script_to_audio
+
         logger.info("Running TTS step")
         script_to_audio(cfg)
     elif args.command == "clone":
         logger.info("Running voice clone step")
-        run_clone(cfg)
+        if args.no_preprocess:
+            cfg.voice_clone_preprocess = False
+        if not run_clone(cfg, args.voice, args.wait, args.timeout):
+            raise SystemExit(1)
+    elif args.command == "cache":
+        run_cache(cfg, args.action, args.max_bytes)
     else:
-        run_all(cfg)
+        run_all(
+            cfg,
+            stream=getattr(args, "stream", False),
+            force=getattr(args, "force", False),
+        )
+
+    _log_cache_counters()
+
+
+def _log_cache_counters() -> None:
+    from .llm import cache_counters
+
+    counters = cache_counters()
+    if counters["hits"] or counters["misses"]:
+        logger.info(
+            "LLM cache: %d hits, %d misses", counters["hits"], counters["misses"]
+        )
 
 
 if __name__ == "__main__":  # pragma: no cover - manual execution
@@ -1,17 +1,14 @@
 import os
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
-try:
-    from dotenv import load_dotenv
-except Exception:  # pragma: no cover - fallback when dotenv is missing
-    def load_dotenv(*args, **kwargs):
-        return None
-import yaml
 import logging
 
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_CHAT_CONCURRENCY = 8
+DEFAULT_CACHE_DIR = ".text2cast_cache"
+DEFAULT_CACHE_MAX_BYTES = 1024 ** 3
 
 @dataclass
 class Config:
@@ -26,11 +23,35 @@ class Config:
     sound_effects: Dict[str, str] = field(default_factory=dict)
     voice_clone_samples: List[str] = field(default_factory=list)
     voice_clone_name: Optional[str] = None
+    voice_clone_voices: Dict[str, List[str]] = field(default_factory=dict)
+    voice_clone_preprocess: bool = True
     tts_engine: str = "openai"
     chat_engine: str = "openai"
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+    cache_max_bytes: Optional[int] = DEFAULT_CACHE_MAX_BYTES
+    cache_limits: Dict[str, int] = field(default_factory=dict)
+    summary_chunk_tokens: int = 12000
+    summary_chunk_concurrency: int = 4
+    scrape_concurrency: int = 8
+    summary_concurrency: int = 4
+    batch_scrape: bool = True
+    scrape_cache_ttl: float = 12 * 3600
+    refresh_scrape: bool = False
+    manifest_path: Optional[str] = None
+    rate_limits: Dict[str, Dict[str, dict]] = field(default_factory=dict)
+    rate_limit_dir: Optional[str] = None
+    segment_max_chars: Optional[int] = None
+    coalesce_chars: int = 12
+    transcode_workers: Optional[int] = None
+    engine_format: str = "auto"
+    progressive: bool = False
+    progressive_chunk_seconds: float = 6.0
 
 
 def load_config(path: str) -> Config:
+    import yaml
+
     logger.debug("Loading config from %s", path)
     with open(path, 'r', encoding='utf-8') as f:
         data = yaml.safe_load(f)
@@ -47,6 +68,11 @@ def load_config(path: str) -> Config:
         tts_model = data['models'].get('tts')
     logger.debug("tts_model resolved to: %s", tts_model)
 
+    max_concurrency = data.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
+    if isinstance(max_concurrency, dict):
+        max_concurrency = max_concurrency.get(tts_engine, DEFAULT_MAX_CONCURRENCY)
+    logger.debug("max_concurrency resolved to: %s", max_concurrency)
+
     speaker_voice = data.get('speaker_voice', {})
     if isinstance(speaker_voice, dict) and tts_engine in speaker_voice:
         speaker_voice = speaker_voice[tts_engine]
@@ -59,12 +85,28 @@ def load_config(path: str) -> Config:
     if isinstance(model_script, dict):
         model_script = model_script.get(chat_engine)
 
-    vc = data.get('voice_clone', {})
+    vc = data.get('voice_clone') or {}
     voice_clone_name = vc.get('name')
     voice_clone_samples = vc.get('samples', []) if isinstance(vc, dict) else []
+    voice_clone_voices = {
+        str(name): list(samples) for name, samples in (vc.get('voices') or {}).items()
+    }
 
     sound_effects = data.get('sound_effects', {})
 
+    summary = data.get('summary') or {}
+    script_v2 = data.get('script_v2') or {}
+
+    cache = data.get('cache') or {}
+    cache_dir = cache.get('dir', DEFAULT_CACHE_DIR)
+    cache_max_bytes = cache.get('max_bytes', DEFAULT_CACHE_MAX_BYTES)
+    cache_limits = cache.get('limits') or {}
+
+    rate_limits = data.get('rate_limits') or {}
+    segment = data.get('segment') or {}
+    transcode = data.get('transcode') or {}
+    progressive = data.get('progressive') or {}
+
     return Config(
         model_summary=model_summary,
         model_script=model_script,
@@ -73,22 +115,83 @@ def load_config(path: str) -> Config:
         brief_path=data['paths']['brief'],
         script_path=data['paths']['script'],
         audio_dir=data['paths']['audio'],
+        manifest_path=data['paths'].get('manifest'),
         speaker_voice=speaker_voice,
         sound_effects=sound_effects,
         voice_clone_samples=voice_clone_samples,
         voice_clone_name=voice_clone_name,
+        voice_clone_voices=voice_clone_voices,
+        voice_clone_preprocess=bool(vc.get('preprocess', True)),
         tts_engine=tts_engine,
         chat_engine=chat_engine,
+        max_concurrency=int(max_concurrency),
+        cache_dir=cache_dir,
+        cache_max_bytes=cache_max_bytes,
+        cache_limits=cache_limits,
+        rate_limits={
+            kind: rate_limits.get(kind) or {} for kind in ('tts', 'chat')
+        },
+        rate_limit_dir=rate_limits.get('shared_dir'),
+        segment_max_chars=segment.get('max_chars'),
+        coalesce_chars=int(segment.get('coalesce_chars', 12)),
+        transcode_workers=transcode.get('workers'),
+        engine_format=str(transcode.get('engine_format', 'auto')),
+        progressive=bool(progressive.get('enabled', False)),
+        progressive_chunk_seconds=float(progressive.get('chunk_seconds', 6.0)),
+        summary_chunk_tokens=int(summary.get('chunk_tokens', 12000)),
+        summary_chunk_concurrency=int(summary.get('concurrency', 4)),
+        scrape_concurrency=int(script_v2.get('scrape_concurrency', 8)),
+        summary_concurrency=int(script_v2.get('summary_concurrency', 4)),
+        batch_scrape=bool(script_v2.get('batch_scrape', True)),
+        scrape_cache_ttl=float(script_v2.get('scrape_cache_ttl', 12 * 3600)),
     )
 
+_ENV_VARS = (
+    'OPENAI_API_KEY', 'VOLCENGINE_TOKEN', 'VOLCENGINE_APP_ID',
+    'MINIMAX_API_KEY', 'MINIMAX_GROUP_ID', 'DEEPSEEK_API_KEY',
+    'VOLCENGINE_TTS_URL', 'VOLCENGINE_CLONE_URL', 'MINIMAX_TTS_URL',
+    'DEEPSEEK_BASE_URL', 'FIRECRAWL_API_URL',
+)
+_dotenv_loaded = False
+
+
+def _load_dotenv() -> None:
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except Exception:  # pragma: no cover - fallback when dotenv is missing
+        return
+    load_dotenv()
+
+
 def load_env_vars() -> None:
     global OPENAI_API_KEY, VOLCENGINE_TOKEN, VOLCENGINE_APP_ID
     global MINIMAX_API_KEY, MINIMAX_GROUP_ID, DEEPSEEK_API_KEY
+    global VOLCENGINE_TTS_URL, VOLCENGINE_CLONE_URL, MINIMAX_TTS_URL
+    global DEEPSEEK_BASE_URL, FIRECRAWL_API_URL
+    _load_dotenv()
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     VOLCENGINE_TOKEN = os.getenv('VOLCENGINE_TOKEN')
     VOLCENGINE_APP_ID = os.getenv('VOLCENGINE_APP_ID')
     MINIMAX_API_KEY = os.getenv('MINIMAX_API_KEY')
     MINIMAX_GROUP_ID = os.getenv('MINIMAX_GROUP_ID')
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
+    # Endpoint overrides, e.g. for the local stubs in ``benchmarks/``. The
+    # OpenAI SDK reads ``OPENAI_BASE_URL`` by itself.
+    VOLCENGINE_TTS_URL = os.getenv('VOLCENGINE_TTS_URL')
+    VOLCENGINE_CLONE_URL = os.getenv('VOLCENGINE_CLONE_URL')
+    MINIMAX_TTS_URL = os.getenv('MINIMAX_TTS_URL')
+    DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL')
+    FIRECRAWL_API_URL = os.getenv('FIRECRAWL_API_URL')
+
 
-load_env_vars()
+def __getattr__(name: str):
+    # The credentials are read from the environment (and ``.env``) on first
+    # use instead of at import time.
+    if name in _ENV_VARS:
+        load_env_vars()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,447 @@
+"""Text-to-speech engines.
+
+Engines implement the :class:`TTSEngine` protocol and are looked up by the
+``tts_engine`` name from the config. Third-party engines can be added with
+:func:`register_engine` or through a ``text2cast.tts_engines`` entry point
+that resolves to an engine class.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import re
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional, Protocol
+
+import httpx
+
+from .config import Config
+from . import config as cfg_module
+from .ratelimit import Throttled, parse_retry_after
+from .segmenter import align_boundaries
+from .transcode import AudioFormat
+from . import mp3
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "text2cast.tts_engines"
+
+_PAUSE_PUNCTUATION = "。！？!?.；;…，,"
+
+
+class TTSEngine(Protocol):
+    """Interface implemented by every text-to-speech engine.
+
+    An engine owns one pooled HTTP client for its lifetime, so all requests
+    of a run share keep-alive connections. ``settings`` returns everything
+    besides model, voice and text that changes the produced audio; it is
+    part of the segment cache key.
+
+    Engines may set ``max_chars``, the longest text sent in one request;
+    longer script entries are split at sentence boundaries. Engines that can
+    return word timestamps may implement ``synthesize_batch(voice, texts)``
+    returning one audio piece per text (or ``None`` if the texts could not
+    be aligned), so short lines can share a request.
+
+    Engines that can return more than one audio format list them in
+    ``formats``, expose the current one as
+    ``output_format`` and switch with ``use_format(fmt)``; the selected
+    format must show up in ``settings``. Engines without ``formats`` return
+    MP3 in any profile.
+    """
+
+    name: str
+    model: str
+
+    def settings(self) -> dict:
+        ...
+
+    async def synthesize(self, voice: str, text: str) -> bytes:
+        ...
+
+    async def aclose(self) -> None:
+        ...
+
+
+async def iter_audio(engine: TTSEngine, voice: str, text: str) -> AsyncIterator[bytes]:
+    """Yield the audio for ``text`` in chunks as it arrives.
+
+    Engines may provide an optional ``stream(voice, text)`` async generator;
+    engines without one are served from :meth:`TTSEngine.synthesize`.
+    """
+    stream = getattr(engine, "stream", None)
+    if stream is None:
+        yield await engine.synthesize(voice, text)
+        return
+    async for chunk in stream(voice, text):
+        yield chunk
+
+
+async def _collect(chunks: AsyncIterator[bytes]) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+class _AudioFieldDecoder:
+    """Incrementally extract an encoded audio string from a JSON response.
+
+    The providers return the audio as one huge hex or base64 string inside a
+    JSON document. Instead of buffering the body, the string value following
+    one of ``keys`` is decoded chunk by chunk; everything else is kept so the
+    surrounding document (with the audio blanked out) can be inspected once
+    the response is complete.
+    """
+
+    def __init__(self, keys, decode: Callable[[bytes], bytes], quantum: int):
+        pattern = b"|".join(re.escape(k.encode()) for k in keys)
+        self._start = re.compile(b'"(?:' + pattern + b')"\\s*:\\s*"')
+        self._decode = decode
+        self._quantum = quantum
+        self._doc = bytearray()
+        self._pending = b""
+        self._state = "search"
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self._state == "search":
+            self._doc += chunk
+            match = self._start.search(self._doc)
+            if not match:
+                return b""
+            chunk = bytes(self._doc[match.end():])
+            del self._doc[match.end():]
+            self._state = "value"
+        if self._state != "value":
+            self._doc += chunk
+            return b""
+        end = chunk.find(b'"')
+        if end >= 0:
+            self._doc += chunk[end:]
+            chunk = chunk[:end]
+            self._state = "done"
+        # JSON may escape "/" as "\/"; neither alphabet contains a backslash.
+        data = self._pending + chunk.replace(b"\\", b"")
+        if self._state == "done":
+            usable = len(data)
+        else:
+            usable = len(data) - len(data) % self._quantum
+        self._pending = data[usable:]
+        return self._decode(data[:usable]) if usable else b""
+
+    @property
+    def found(self) -> bool:
+        return self._state != "search"
+
+    def document(self) -> dict:
+        return json.loads(bytes(self._doc))
+
+
+_ENGINES: Dict[str, Callable[[Config], TTSEngine]] = {}
+
+
+def register_engine(name: str):
+    """Class decorator registering an engine under ``name``."""
+
+    def decorator(factory):
+        _ENGINES[name] = factory
+        return factory
+
+    return decorator
+
+
+def _load_entry_point(name: str) -> Optional[Callable[[Config], TTSEngine]]:
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        candidates = eps.select(group=ENTRY_POINT_GROUP, name=name)
+    else:  # pragma: no cover - Python < 3.10
+        candidates = [ep for ep in eps.get(ENTRY_POINT_GROUP, []) if ep.name == name]
+    for ep in candidates:
+        logger.debug("Loading TTS engine %s from %s", name, ep.value)
+        return ep.load()
+    return None
+
+
+def create_engine(cfg: Config) -> TTSEngine:
+    """Instantiate the engine selected by ``cfg.tts_engine``."""
+    factory = _ENGINES.get(cfg.tts_engine) or _load_entry_point(cfg.tts_engine)
+    if factory is None:
+        raise ValueError(f"Unknown tts_engine: {cfg.tts_engine}")
+    _ENGINES[cfg.tts_engine] = factory
+    return factory(cfg)
+
+
+def _http_client(cfg: Config, timeout: float) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=max(1, cfg.max_concurrency),
+        max_keepalive_connections=max(1, cfg.max_concurrency),
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+def _check_status(resp: httpx.Response) -> None:
+    """Raise :class:`Throttled` for HTTP 429, ``HTTPStatusError`` for errors."""
+    if resp.status_code == 429:
+        raise Throttled(
+            f"HTTP 429 from {resp.url.host}",
+            parse_retry_after(resp.headers.get("Retry-After")),
+        )
+    resp.raise_for_status()
+
+
+@register_engine("openai")
+class OpenAIEngine:
+    name = "openai"
+    max_chars = 4000
+    formats = [AudioFormat("mp3", 24000), AudioFormat("pcm", 24000)]
+
+    def __init__(self, cfg: Config):
+        # The SDK takes most of a second to import; only this engine needs it.
+        import openai
+
+        logger.debug("Creating OpenAI client for TTS")
+        self.model = cfg.tts_model
+        self.client = openai.AsyncOpenAI(api_key=cfg_module.OPENAI_API_KEY)
+        self.output_format = AudioFormat("mp3", 24000)
+
+    def use_format(self, fmt: AudioFormat) -> None:
+        self.output_format = fmt
+
+    def settings(self) -> dict:
+        # MP3 is the API default; leaving it out keeps existing cache keys.
+        if self.output_format.codec == "mp3":
+            return {}
+        return {"response_format": self.output_format.codec}
+
+    async def synthesize(self, voice: str, text: str) -> bytes:
+        return await _collect(self.stream(voice, text))
+
+    async def stream(self, voice: str, text: str) -> AsyncIterator[bytes]:
+        import openai
+
+        try:
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=self.model,
+                voice=voice,
+                input=text,
+                response_format=self.output_format.codec,
+            ) as response:
+                async for chunk in response.iter_bytes():
+                    yield chunk
+        except openai.RateLimitError as e:
+            # Raised once the SDK's own retries are exhausted.
+            raise Throttled(
+                str(e), parse_retry_after(e.response.headers.get("retry-after"))
+            ) from e
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+@register_engine("volcengine")
+class VolcengineEngine:
+    name = "volcengine"
+    url = "https://openspeech.bytedance.com/api/v1/tts"
+    audio = {"encoding": "mp3", "rate": 24000, "speed_ratio": 1.0}
+    formats = [
+        AudioFormat(codec, rate)
+        for codec in ("mp3", "pcm")
+        for rate in (24000, 16000, 8000)
+    ]
+    # The API accepts 1024 bytes of UTF-8 text per request.
+    max_chars = 300
+
+    def __init__(self, cfg: Config):
+        logger.debug("Using Volcengine HTTP API for TTS")
+        if not cfg_module.VOLCENGINE_TOKEN or not cfg_module.VOLCENGINE_APP_ID:
+            raise ValueError("VOLCENGINE_TOKEN or VOLCENGINE_APP_ID not set")
+        self.model = cfg.tts_model
+        self.url = cfg_module.VOLCENGINE_TTS_URL or self.url
+        self.client = _http_client(cfg, timeout=30)
+        self.audio = dict(self.audio)
+
+    @property
+    def output_format(self) -> AudioFormat:
+        return AudioFormat(self.audio["encoding"], self.audio["rate"])
+
+    def use_format(self, fmt: AudioFormat) -> None:
+        self.audio = {**self.audio, "encoding": fmt.codec, "rate": fmt.rate}
+
+    def settings(self) -> dict:
+        return self.audio
+
+    async def synthesize(self, voice: str, text: str) -> bytes:
+        return await _collect(self.stream(voice, text))
+
+    def _payload(self, voice: str, text: str, **request) -> dict:
+        return {
+            "app": {
+                "appid": cfg_module.VOLCENGINE_APP_ID,
+                "token": cfg_module.VOLCENGINE_TOKEN,
+                "cluster": self.model,
+            },
+            "user": {"uid": "text2cast"},
+            "audio": {"voice_type": voice, **self.audio},
+            # "resource_id": "volc.tts_async.emotion",
+            "request": {
+                "reqid": str(uuid.uuid4()),
+                "text": text,
+                "text_type": "plain",
+                "operation": "query",
+                "sequence": 1,
+                **request,
+            },
+        }
+
+    async def _post(
+        self, payload: dict, decoder: _AudioFieldDecoder
+    ) -> AsyncIterator[bytes]:
+        headers = {"Authorization": f"Bearer;{cfg_module.VOLCENGINE_TOKEN}"}
+        async with self.client.stream(
+            "POST", self.url, json=payload, headers=headers
+        ) as resp:
+            _check_status(resp)
+            async for chunk in resp.aiter_bytes():
+                audio = decoder.feed(chunk)
+                if audio:
+                    yield audio
+        data = decoder.document()
+
+        logger.debug("data.get('code'): %s", data.get("code"))
+
+        # 3003 is Volcengine's concurrency limit and 3005 a busy backend;
+        # both come with HTTP 200, so the rate limiter backs off on the code.
+        if data.get("code") in (3003, 3005):
+            raise Throttled(str(data.get("message") or data))
+        if not decoder.found:
+            raise RuntimeError(data)
+
+    @staticmethod
+    def _decoder() -> _AudioFieldDecoder:
+        # ``data`` is either the base64 audio itself or an object with an
+        # ``audio`` field.
+        return _AudioFieldDecoder(("data", "audio"), base64.b64decode, 4)
+
+    async def stream(self, voice: str, text: str) -> AsyncIterator[bytes]:
+        async for audio in self._post(self._payload(voice, text), self._decoder()):
+            yield audio
+
+    async def synthesize_batch(
+        self, voice: str, texts: List[str]
+    ) -> Optional[List[bytes]]:
+        """Speak ``texts`` in one request and cut the audio at the word timestamps."""
+        if self.audio["encoding"] not in ("mp3", "pcm"):
+            return None
+        # Every line ends with punctuation so the model pauses between them.
+        joined = "".join(t if t[-1:] in _PAUSE_PUNCTUATION else t + "。" for t in texts)
+        decoder = self._decoder()
+        payload = self._payload(voice, joined, with_frontend=1, frontend_type="unitTson")
+        audio = await _collect(self._post(payload, decoder))
+        frontend = decoder.document().get("addition", {}).get("frontend")
+        try:
+            words = json.loads(frontend).get("words", []) if frontend else []
+        except ValueError:
+            words = []
+        cuts = align_boundaries(texts, words)
+        if cuts is None:
+            logger.debug("Could not align %d coalesced lines", len(texts))
+            return None
+        if self.audio["encoding"] == "pcm":
+            return _split_pcm(audio, cuts, self.output_format)
+        return mp3.split(audio, cuts)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def _split_pcm(data: bytes, times: List[float], fmt: AudioFormat) -> List[bytes]:
+    """Cut raw PCM at ``times``; unlike MP3 the cuts are sample accurate."""
+    frame = 2 * fmt.channels
+    offsets = [min(len(data), round(t * fmt.rate) * frame) for t in sorted(times)]
+    bounds = [0] + offsets + [len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@register_engine("minimax")
+class MinimaxEngine:
+    name = "minimax"
+    url = "https://api.minimax.chat/v1/t2a_v2"
+    voice_setting = {"speed": 1.2, "pitch": 0, "vol": 1, "latex_read": False}
+    audio_setting = {"sample_rate": 32000, "bitrate": 128000, "format": "mp3"}
+    # The API offers no 192 kbps MP3, so none of these matches the output
+    # profile and PCM is encoded once instead.
+    formats = [
+        AudioFormat(codec, rate, channels, bitrate)
+        for codec, channels, bitrate in (("mp3", 1, 128), ("mp3", 2, 128), ("pcm", 1, 0))
+        for rate in (44100, 32000, 24000, 22050, 16000, 8000)
+    ]
+    max_chars = 3000
+
+    def __init__(self, cfg: Config):
+        logger.debug("Using Minimax HTTP API for TTS")
+        if not cfg_module.MINIMAX_API_KEY or not cfg_module.MINIMAX_GROUP_ID:
+            raise ValueError("MINIMAX_API_KEY or MINIMAX_GROUP_ID not set")
+        self.model = cfg.tts_model
+        self.url = cfg_module.MINIMAX_TTS_URL or self.url
+        self.client = _http_client(cfg, timeout=60)
+        self.audio_setting = dict(self.audio_setting)
+
+    @property
+    def output_format(self) -> AudioFormat:
+        setting = self.audio_setting
+        bitrate = setting["bitrate"] // 1000 if setting["format"] == "mp3" else 0
+        return AudioFormat(
+            setting["format"], setting["sample_rate"], setting.get("channel", 1), bitrate
+        )
+
+    def use_format(self, fmt: AudioFormat) -> None:
+        setting = {
+            **self.audio_setting,
+            "format": fmt.codec,
+            "sample_rate": fmt.rate,
+        }
+        # Mono is the API default; leaving it out keeps existing cache keys.
+        setting.pop("channel", None)
+        if fmt.channels != 1:
+            setting["channel"] = fmt.channels
+        if fmt.bitrate:
+            setting["bitrate"] = fmt.bitrate * 1000
+        self.audio_setting = setting
+
+    def settings(self) -> dict:
+        return {"voice": self.voice_setting, "audio": self.audio_setting}
+
+    async def synthesize(self, voice: str, text: str) -> bytes:
+        return await _collect(self.stream(voice, text))
+
+    async def stream(self, voice: str, text: str) -> AsyncIterator[bytes]:
+        payload = {
+            "model": self.model,
+            "text": text,
+            "timber_weights": [{"voice_id": voice, "weight": 1}],
+            "voice_setting": {"voice_id": voice, **self.voice_setting},
+            "audio_setting": dict(self.audio_setting),
+            "language_boost": "auto",
+        }
+        params = {"GroupId": cfg_module.MINIMAX_GROUP_ID}
+        headers = {"Authorization": f"Bearer {cfg_module.MINIMAX_API_KEY}"}
+
+        decoder = _AudioFieldDecoder(("audio",), binascii.unhexlify, 2)
+        async with self.client.stream(
+            "POST", self.url, params=params, headers=headers, json=payload
+        ) as resp:
+            _check_status(resp)
+            async for chunk in resp.aiter_bytes():
+                audio = decoder.feed(chunk)
+                if audio:
+                    yield audio
+        data = decoder.document()
+        status = data.get("base_resp", {}).get("status_code")
+        # 1002 is Minimax's rate limit; the rate limiter backs off and retries.
+        if status == 1002:
+            raise Throttled(str(data.get("base_resp")))
+        if status != 0:
+            raise RuntimeError(data)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,163 @@
+"""Shared chat completion helper with a persistent response cache."""
+
+import json
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from .cache import DiskCache, make_key, open_cache
+from .config import Config
+from . import config as cfg_module
+from . import trace
+from .ratelimit import MAX_ATTEMPTS, Throttled, get_limiter, parse_retry_after
+
+if TYPE_CHECKING:
+    import openai
+
+logger = logging.getLogger(__name__)
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+_clients: Dict[str, "openai.OpenAI"] = {}
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0}
+
+
+def get_client(chat_engine: str) -> "openai.OpenAI":
+    """Return the process-wide client for ``chat_engine``.
+
+    Clients keep their HTTP connection pool, so every stage (and every
+    episode in the same process) reuses the same connections.
+    """
+    with _lock:
+        client = _clients.get(chat_engine)
+        if client is None:
+            # Imported on first use, so commands without chat requests skip
+            # the SDK import.
+            import openai
+
+            logger.debug("Creating OpenAI client for chat engine %s", chat_engine)
+            if chat_engine == "deepseek":
+                client = openai.OpenAI(
+                    api_key=cfg_module.DEEPSEEK_API_KEY,
+                    base_url=cfg_module.DEEPSEEK_BASE_URL or DEEPSEEK_BASE_URL,
+                )
+            else:
+                client = openai.OpenAI(api_key=cfg_module.OPENAI_API_KEY)
+            _clients[chat_engine] = client
+        return client
+
+
+def _create(cfg: Config, **kwargs):
+    import openai
+
+    try:
+        return get_client(cfg.chat_engine).chat.completions.create(**kwargs)
+    except openai.RateLimitError as e:
+        raise Throttled(
+            str(e), parse_retry_after(e.response.headers.get("retry-after"))
+        ) from e
+
+
+def _lookup(
+    cfg: Config, model: str, messages: List[Dict[str, str]], params: dict
+) -> Tuple[Optional[DiskCache], str, Optional[str]]:
+    """Return the cache, the key and the cached content (or ``None``)."""
+    cache = open_cache(cfg, "llm", ".json")
+    key = make_key(
+        engine=cfg.chat_engine, model=model, messages=messages, params=params
+    )
+    if cache is not None:
+        path = cache.get(key)
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = json.load(f)["content"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Ignoring unreadable LLM cache entry %s: %s", path, e)
+            else:
+                _count("hits")
+                logger.debug("LLM cache hit for model %s", model)
+                return cache, key, content
+    _count("misses")
+    return cache, key, None
+
+
+def _store(
+    cache: Optional[DiskCache], key: str, model: str, content: Optional[str]
+) -> None:
+    if cache is not None and content is not None:
+        data = json.dumps({"model": model, "content": content}, ensure_ascii=False)
+        cache.put_bytes(key, data.encode("utf-8"))
+
+
+def complete(cfg: Config, model: str, messages: List[Dict[str, str]], **params) -> str:
+    """Return the completion text for ``messages``.
+
+    Responses are cached under ``llm`` in the cache directory, keyed by chat
+    engine, model, messages and any extra request parameters, so re-running
+    a step with unchanged input costs no API time.
+    """
+    cache, key, content = _lookup(cfg, model, messages, params)
+    if content is not None:
+        trace.event("cache hit", "llm", model=model)
+        return content
+    limiter = get_limiter(cfg, "chat", cfg.chat_engine)
+    with trace.span("completion", "llm", model=model) as span:
+        resp = limiter.call(
+            lambda: _create(cfg, model=model, messages=messages, **params)
+        )
+        content = resp.choices[0].message.content
+        span.set(bytes=len((content or "").encode("utf-8")))
+    _store(cache, key, model, content)
+    return content
+
+
+def stream_complete(
+    cfg: Config, model: str, messages: List[Dict[str, str]], **params
+) -> Iterator[str]:
+    """Yield the completion text for ``messages`` as it is generated.
+
+    Shares the cache with :func:`complete`; a cached response is yielded as
+    a single chunk. The response is only cached once the stream finished.
+    """
+    cache, key, content = _lookup(cfg, model, messages, params)
+    if content is not None:
+        trace.event("cache hit", "llm", model=model)
+        yield content
+        return
+    limiter = get_limiter(cfg, "chat", cfg.chat_engine)
+    parts = []
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            with limiter.request(), trace.span(
+                "streamed completion", "llm", model=model
+            ) as span:
+                stream = _create(
+                    cfg, model=model, messages=messages, stream=True, **params
+                )
+                for event in stream:
+                    if not event.choices:
+                        continue
+                    delta = event.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        span.add("bytes", len(delta.encode("utf-8")))
+                        yield delta
+            break
+        except Throttled:
+            # Only a request that produced nothing yet can be repeated.
+            if parts or attempt == MAX_ATTEMPTS:
+                raise
+    _store(cache, key, model, "".join(parts))
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _counters[name] += 1
+
+
+def cache_counters() -> Dict[str, int]:
+    """Return the LLM cache hit and miss counts of this process."""
+    with _lock:
+        return dict(_counters)
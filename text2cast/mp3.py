@@ -0,0 +1,220 @@
+"""Minimal MPEG audio Layer III helpers that work without ffmpeg."""
+
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+# Bitrate tables (kbps) for Layer III, indexed by the header bitrate index.
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+}
+# MPEG 2.5 shares the MPEG 2 bitrates; it is only ever parsed, not written.
+_SAMPLE_RATES_25 = [11025, 12000, 8000]
+
+
+def _version(sample_rate: int) -> int:
+    for version, rates in _SAMPLE_RATES.items():
+        if sample_rate in rates:
+            return version
+    raise ValueError(f"Unsupported MP3 sample rate: {sample_rate}")
+
+
+def _header(version: int, bitrate: int, sample_rate: int, channels: int, padding: bool) -> bytes:
+    try:
+        br_index = _BITRATES[version].index(bitrate)
+    except ValueError:
+        raise ValueError(f"Unsupported MP3 bitrate: {bitrate} kbps") from None
+    sr_index = _SAMPLE_RATES[version].index(sample_rate)
+    mode = 0b11 if channels == 1 else 0b00
+    return bytes(
+        [
+            0xFF,
+            0xFB if version == 1 else 0xF3,
+            (br_index << 4) | (sr_index << 2) | (int(padding) << 1),
+            mode << 6,
+        ]
+    )
+
+
+@lru_cache(maxsize=64)
+def silence(duration: float, sample_rate: int, channels: int, bitrate: int) -> bytes:
+    """Return CBR Layer III frames that decode to ``duration`` seconds of silence.
+
+    A frame whose side information is all zero carries no spectral data, so
+    it decodes to digital silence. Frames are padded the same way an encoder
+    would so the stream keeps the exact nominal bitrate.
+    """
+    version = _version(sample_rate)
+    samples_per_frame = 1152 if version == 1 else 576
+    coefficient = samples_per_frame // 8
+    count = max(1, round(duration * sample_rate / samples_per_frame))
+
+    frames = []
+    remainder = 0
+    for _ in range(count):
+        size, rest = divmod(coefficient * bitrate * 1000, sample_rate)
+        remainder += rest
+        padding = remainder >= sample_rate
+        if padding:
+            remainder -= sample_rate
+            size += 1
+        header = _header(version, bitrate, sample_rate, channels, padding)
+        frames.append(header + bytes(size - len(header)))
+    return b"".join(frames)
+
+
+def info_frame(
+    sample_rate: int,
+    channels: int,
+    bitrate: int,
+    frame_count: int,
+    byte_count: int,
+    vbr: bool,
+) -> bytes:
+    """Return a Xing (``vbr``) or Info frame announcing the stream length.
+
+    Players take the duration from it instead of extrapolating the bitrate
+    of the first frame, which is wrong for streams joined from different
+    bitrates. ``byte_count`` includes the frame itself.
+    """
+    version = _version(sample_rate)
+    samples_per_frame = 1152 if version == 1 else 576
+    size = (samples_per_frame // 8) * bitrate * 1000 // sample_rate
+    if version == 1:
+        side_info = 17 if channels == 1 else 32
+    else:
+        side_info = 9 if channels == 1 else 17
+    # Flags 0x3: the frame and byte counts are present.
+    fields = b"".join(n.to_bytes(4, "big") for n in (3, frame_count, byte_count))
+    frame = (
+        _header(version, bitrate, sample_rate, channels, False)
+        + bytes(side_info)
+        + (b"Xing" if vbr else b"Info")
+        + fields
+    )
+    return frame + bytes(size - len(frame))
+
+
+def _parse_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int]]:
+    """Return ``(frame length, samples, sample rate)`` of a Layer III header."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0b11
+    layer_bits = (data[pos + 1] >> 1) & 0b11
+    br_index = data[pos + 2] >> 4
+    sr_index = (data[pos + 2] >> 2) & 0b11
+    if version_bits == 0b01 or layer_bits != 0b01:
+        return None
+    if br_index in (0, 15) or sr_index == 3:
+        return None
+    padding = (data[pos + 2] >> 1) & 1
+    if version_bits == 0b11:
+        bitrate, rate, samples = _BITRATES[1][br_index], _SAMPLE_RATES[1][sr_index], 1152
+    else:
+        rates = _SAMPLE_RATES[2] if version_bits == 0b10 else _SAMPLE_RATES_25
+        bitrate, rate, samples = _BITRATES[2][br_index], rates[sr_index], 576
+    length = (samples // 8) * bitrate * 1000 // rate + padding
+    return length, samples, rate
+
+
+def _skip_id3(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    return 10 + size
+
+
+def _is_info_frame(frame: bytes) -> bool:
+    # Xing/Info/VBRI headers describe the whole file; after concatenation or
+    # splitting they would be wrong, and they decode as a silent frame. The
+    # tag sits right after the side information (Xing/Info) or at a fixed
+    # offset (VBRI); audio data that happens to contain it elsewhere is kept.
+    mpeg1 = (frame[1] >> 3) & 0b11 == 0b11
+    mono = frame[3] >> 6 == 0b11
+    if mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    # A cleared protection bit means a 16-bit CRC follows the header.
+    offset = 4 + (0 if frame[1] & 1 else 2) + side_info
+    return frame[offset:offset + 4] in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+
+def frames(data: bytes) -> Iterator[Tuple[int, int, int, int]]:
+    """Yield ``(offset, length, samples, sample rate)`` for every audio frame.
+
+    ID3 tags and a leading Xing/Info/VBRI frame are skipped; garbage between
+    frames is skipped by searching for the next frame sync.
+    """
+    pos = _skip_id3(data)
+    first = True
+    while pos < len(data):
+        header = _parse_header(data, pos)
+        if header is None or pos + header[0] > len(data):
+            nxt = data.find(b"\xff", pos + 1)
+            if nxt < 0 or header is not None:
+                return
+            pos = nxt
+            continue
+        length, samples, rate = header
+        if not (first and _is_info_frame(data[pos:pos + length])):
+            yield pos, length, samples, rate
+        first = False
+        pos += length
+
+
+def stream_info(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return ``(sample rate, channels)`` of the first audio frame."""
+    for pos, _, _, rate in frames(data):
+        return rate, 1 if data[pos + 3] >> 6 == 0b11 else 2
+    return None
+
+
+def bitrate(data: bytes, pos: int) -> int:
+    """Return the bitrate (kbps) of the frame at ``pos``."""
+    version = 1 if (data[pos + 1] >> 3) & 0b11 == 0b11 else 2
+    return _BITRATES[version][data[pos + 2] >> 4]
+
+
+def concat(parts: List[bytes]) -> bytes:
+    """Join MP3 streams with identical parameters into one stream."""
+    out = bytearray()
+    for data in parts:
+        for pos, length, _, _ in frames(data):
+            out += data[pos:pos + length]
+    return bytes(out)
+
+
+def duration(data: bytes) -> float:
+    """Return the duration of an MP3 stream in seconds."""
+    return sum(samples / rate for _, _, samples, rate in frames(data))
+
+
+def split(data: bytes, times: List[float]) -> List[bytes]:
+    """Cut an MP3 stream at the frame boundaries closest to ``times``.
+
+    Returns ``len(times) + 1`` pieces. Cuts are only frame accurate and the
+    first frame of a piece may lose bits borrowed from its predecessor, so
+    cuts belong in pauses.
+    """
+    pieces: List[bytes] = []
+    current = bytearray()
+    cuts = sorted(times)
+    elapsed = 0.0
+    for pos, length, samples, rate in frames(data):
+        frame_time = samples / rate
+        while cuts and elapsed + frame_time / 2 > cuts[0]:
+            pieces.append(bytes(current))
+            current = bytearray()
+            cuts.pop(0)
+        current += data[pos:pos + length]
+        elapsed += frame_time
+    pieces.append(bytes(current))
+    pieces.extend(b"" for _ in cuts)
+    return pieces
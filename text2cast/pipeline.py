@@ -0,0 +1,268 @@
+"""Incremental execution of the pipeline stages.
+
+Each stage declares the files it reads and writes, the configuration and
+prompt text it depends on and the stages it has to wait for. A manifest
+stores the fingerprint of every stage that completed; a stage whose
+fingerprint is unchanged and whose outputs still exist is skipped.
+Independent stages run concurrently.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+from .cache import file_digest, make_key
+from .config import Config
+from .engines import TTSEngine
+from .progressive import PLAYLIST_NAME
+from .prompts import BRIEF2SCRIPT, CHUNK2NOTES, INPUT2BRIEF
+from .script import SoundEffectEntry, iter_script
+from .script_generator import brief_to_script, stream_script
+from .summarizer import input_to_brief
+from . import trace
+from . import tts
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".text2cast_manifest.json"
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], object]
+    # A callable is resolved when the stage is about to run, for inputs that
+    # are only known once the dependencies produced their outputs.
+    inputs: Union[List[str], Callable[[], List[str]]] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    deps: List[str] = field(default_factory=list)
+
+    def fingerprint(self) -> str:
+        """Hash of the stage inputs' content and its parameters."""
+        paths = self.inputs() if callable(self.inputs) else self.inputs
+        inputs = {
+            path: file_digest(path) if os.path.exists(path) else None
+            for path in paths
+        }
+        return make_key(stage=self.name, inputs=inputs, params=self.params)
+
+
+class Manifest:
+    """Stage fingerprints persisted as JSON and rewritten atomically."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.stages: Dict[str, dict] = json.load(f).get("stages", {})
+        except FileNotFoundError:
+            self.stages = {}
+        except ValueError as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", path, e)
+            self.stages = {}
+
+    def is_current(self, stage: Stage, fingerprint: str) -> bool:
+        entry = self.stages.get(stage.name)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        return all(os.path.exists(path) for path in stage.outputs)
+
+    def record(self, stage: Stage, fingerprint: str) -> None:
+        with self._lock:
+            self.stages[stage.name] = {
+                "fingerprint": fingerprint,
+                "finished_at": time.time(),
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stages": self.stages}, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+def manifest_path(cfg: Config) -> str:
+    if cfg.manifest_path:
+        return cfg.manifest_path
+    return os.path.join(os.path.dirname(cfg.script_path) or ".", MANIFEST_NAME)
+
+
+def run_stages(stages: List[Stage], manifest: Manifest, force: bool = False) -> List[str]:
+    """Run ``stages`` in dependency order, skipping the up-to-date ones.
+
+    A stage is fingerprinted only once its dependencies finished, because
+    their outputs are its inputs. Returns the names of the stages that ran.
+    The first failure stops scheduling new stages and is re-raised after the
+    running ones complete.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown {missing}")
+
+    def execute(stage: Stage) -> bool:
+        fingerprint = stage.fingerprint()
+        if not force and manifest.is_current(stage, fingerprint):
+            logger.info("Stage %s is up to date", stage.name)
+            trace.event(stage.name, "stage", skipped=True)
+            return False
+        logger.info("Running stage %s", stage.name)
+        with trace.span(stage.name, "stage"):
+            stage.run()
+        # Outputs of the stage are fingerprinted by its dependents, the
+        # stage itself only records what it was built from.
+        manifest.record(stage, fingerprint)
+        return True
+
+    done: Dict[str, bool] = {}
+    ran: List[str] = []
+    error: Optional[BaseException] = None
+    pending = list(stages)
+    with ThreadPoolExecutor(max_workers=max(1, len(stages))) as pool:
+        running = {}
+        while pending or running:
+            if error is None:
+                for stage in [s for s in pending if all(d in done for d in s.deps)]:
+                    pending.remove(stage)
+                    running[pool.submit(execute, stage)] = stage
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    if future.result():
+                        ran.append(stage.name)
+                    done[stage.name] = True
+                except Exception as e:
+                    logger.error("Stage %s failed: %s", stage.name, e)
+                    if error is None:
+                        error = e
+    if error is not None:
+        raise error
+    return ran
+
+
+def _sound_effect_inputs(cfg: Config, script_path: Optional[str] = None) -> List[str]:
+    """Return the sound effect files configured or referenced by the script."""
+    paths = [tts.sound_effect_path(cfg, p) for p in cfg.sound_effects.values()]
+    if script_path and os.path.exists(script_path):
+        try:
+            for item in iter_script(script_path):
+                if isinstance(item, SoundEffectEntry):
+                    paths.append(tts.sound_effect_path(cfg, item.path))
+        except ValueError:
+            # The TTS stage reports the invalid script.
+            pass
+    return sorted(set(paths))
+
+
+def build_stages(
+    cfg: Config,
+    stream: bool = False,
+    engine: Optional[TTSEngine] = None,
+) -> List[Stage]:
+    """Return the stages of the ``all`` command.
+
+    Sound effects are normalized while the brief and the script are being
+    generated. With ``stream`` script generation and TTS are one stage.
+    ``engine`` is handed to :func:`tts.script_to_audio`.
+    """
+    combined = os.path.join(cfg.audio_dir, "combined.mp3")
+    audio_outputs = [combined]
+    if cfg.progressive:
+        audio_outputs.append(
+            os.path.join(cfg.audio_dir, tts.PROGRESSIVE_DIR, PLAYLIST_NAME)
+        )
+    profile = [tts.TARGET_RATE, tts.TARGET_CH, tts.BITRATE]
+    script_params = {
+        "chat_engine": cfg.chat_engine,
+        "model": cfg.model_script,
+        "prompt": BRIEF2SCRIPT,
+    }
+    # Everything script_to_audio reads that changes what it writes.
+    tts_params = {
+        "tts_engine": cfg.tts_engine,
+        "tts_model": cfg.tts_model,
+        "speaker_voice": cfg.speaker_voice,
+        "profile": profile,
+        "engine_format": cfg.engine_format,
+        "coalesce_chars": cfg.coalesce_chars,
+        "segment_max_chars": cfg.segment_max_chars,
+        "progressive": cfg.progressive,
+        "progressive_chunk_seconds": cfg.progressive_chunk_seconds,
+    }
+    stages = [
+        Stage(
+            "summary",
+            lambda: input_to_brief(cfg),
+            inputs=[cfg.input_path],
+            outputs=[cfg.brief_path],
+            params={
+                "chat_engine": cfg.chat_engine,
+                "model": cfg.model_summary,
+                "chunk_tokens": cfg.summary_chunk_tokens,
+                "prompts": [INPUT2BRIEF, CHUNK2NOTES],
+            },
+        ),
+        Stage(
+            "assets",
+            lambda: tts.prepare_assets(cfg),
+            inputs=_sound_effect_inputs(cfg),
+            params={"profile": profile, "cache_dir": cfg.cache_dir},
+        ),
+    ]
+    if stream:
+        stages.append(
+            Stage(
+                "script_audio",
+                lambda: tts.script_to_audio(
+                    cfg, engine, stream_script(cfg), strict=True
+                ),
+                inputs=lambda: [cfg.brief_path] + _sound_effect_inputs(cfg),
+                outputs=[cfg.script_path] + audio_outputs,
+                params={"script": script_params, "tts": tts_params},
+                deps=["summary", "assets"],
+            )
+        )
+    else:
+        stages += [
+            Stage(
+                "script",
+                lambda: brief_to_script(cfg),
+                inputs=[cfg.brief_path],
+                outputs=[cfg.script_path],
+                params=script_params,
+                deps=["summary"],
+            ),
+            Stage(
+                "tts",
+                lambda: tts.script_to_audio(cfg, engine, strict=True),
+                inputs=lambda: [cfg.script_path]
+                + _sound_effect_inputs(cfg, cfg.script_path),
+                outputs=audio_outputs,
+                params=tts_params,
+                deps=["script", "assets"],
+            ),
+        ]
+    return stages
+
+
+def run_pipeline(
+    cfg: Config,
+    stream: bool = False,
+    force: bool = False,
+    engine: Optional[TTSEngine] = None,
+) -> List[str]:
+    """Run the ``all`` stages that are out of date; ``force`` runs every stage."""
+    manifest = Manifest(manifest_path(cfg))
+    ran = run_stages(build_stages(cfg, stream, engine), manifest, force)
+    logger.info("Stages run: %s", ", ".join(ran) or "none, everything up to date")
+    return ran
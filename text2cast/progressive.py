@@ -0,0 +1,169 @@
+"""Progressive episode output as an HLS event playlist.
+
+While the TTS step runs, the frames of finished entries are cut into chunks
+of at most ``chunk_seconds`` and listed in ``episode.m3u8`` in script order,
+as soon as every earlier entry is done. A player opened on the playlist
+starts within seconds and keeps following it until the playlist is closed
+after the last entry.
+"""
+
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from . import mp3
+from . import trace
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_NAME = "episode.m3u8"
+CHUNK_PREFIX = "chunk_"
+
+
+class ProgressivePlaylist:
+    """HLS event playlist that grows while the entries of a script finish.
+
+    Entries are reported with :meth:`add` or :meth:`fail` in any order and
+    from any thread; only the contiguous prefix of finished entries is
+    published. Skipped entries are left out, as they are in the combined
+    file, while a failed entry ends the playlist before it. A change of
+    sample rate or channels starts a new chunk marked as a discontinuity.
+    """
+
+    def __init__(self, directory: str, chunk_seconds: float = 6.0):
+        if chunk_seconds <= 0:
+            raise ValueError("chunk_seconds must be positive")
+        self.directory = directory
+        self.path = os.path.join(directory, PLAYLIST_NAME)
+        self.chunk_seconds = chunk_seconds
+        self._lock = threading.Lock()
+        self._finished: Dict[int, Optional[str]] = {}
+        self._next = 0
+        self._failed: Optional[int] = None
+        self._frames = bytearray()
+        self._duration = 0.0
+        self._stream: Optional[Tuple[int, int]] = None
+        self._discontinuity = False
+        self._elapsed = 0.0
+        # (duration, file name, discontinuity) of every published chunk.
+        self._chunks: List[Tuple[float, str, bool]] = []
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith(CHUNK_PREFIX) or name == PLAYLIST_NAME:
+                os.remove(os.path.join(directory, name))
+        # An empty playlist lets a player be started right away.
+        self._write_playlist()
+
+    def add(self, index: int, path: Optional[str]) -> None:
+        """Report entry ``index`` as finished with the audio file ``path``.
+
+        ``path`` is ``None`` for entries without audio.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._finished[index] = path
+            published = len(self._chunks)
+            self._publish()
+            if len(self._chunks) > published:
+                self._write_playlist()
+
+    def fail(self, index: int) -> None:
+        """Report entry ``index`` as failed; nothing after it is published."""
+        with self._lock:
+            if self._failed is None or index < self._failed:
+                self._failed = index
+
+    def close(self) -> None:
+        """Publish the remaining prefix and mark the playlist complete.
+
+        Entries finished after a failed or missing one are left out, so the
+        playlist never skips a line of the script.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._publish()
+            if self._finished or self._failed is not None:
+                logger.warning(
+                    "%s ends before entry %d (%s); %d later entries left out",
+                    self.path,
+                    self._next,
+                    "failed" if self._failed == self._next else "missing",
+                    len(self._finished),
+                )
+            self._flush()
+            self._closed = True
+            self._write_playlist()
+        logger.debug(
+            "Closed %s with %d chunks (%.1fs)",
+            self.path,
+            len(self._chunks),
+            self._elapsed,
+        )
+
+    def _publish(self) -> None:
+        while self._next in self._finished:
+            path = self._finished.pop(self._next)
+            self._next += 1
+            if path:
+                self._append(path)
+
+    def _append(self, path: str) -> None:
+        with open(path, "rb") as f:
+            data = f.read()
+        stream = mp3.stream_info(data)
+        if stream is None:
+            logger.warning("%s holds no MP3 frames; left out of %s", path, self.path)
+            return
+        if stream != self._stream:
+            if self._stream is not None:
+                self._flush()
+                self._discontinuity = True
+            self._stream = stream
+        for pos, length, samples, rate in mp3.frames(data):
+            frame_time = samples / rate
+            if self._frames and self._duration + frame_time > self.chunk_seconds:
+                self._flush()
+            self._frames += data[pos:pos + length]
+            self._duration += frame_time
+
+    def _flush(self) -> None:
+        if not self._frames:
+            return
+        name = f"{CHUNK_PREFIX}{len(self._chunks):05d}.mp3"
+        chunk_path = os.path.join(self.directory, name)
+        # Plain MP3 chunks: players decode them as one continuous stream.
+        # An ID3 timestamp per chunk made ffmpeg's HLS demuxer drift by a
+        # frame at chunk boundaries.
+        with trace.span("publish chunk", "file", bytes=len(self._frames)):
+            with open(chunk_path + ".part", "wb") as f:
+                f.write(self._frames)
+            os.replace(chunk_path + ".part", chunk_path)
+        self._chunks.append((self._duration, name, self._discontinuity))
+        self._elapsed += self._duration
+        self._frames = bytearray()
+        self._duration = 0.0
+        self._discontinuity = False
+
+    def _write_playlist(self) -> None:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{math.ceil(self.chunk_seconds)}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for duration, name, discontinuity in self._chunks:
+            if discontinuity:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines += [f"#EXTINF:{duration:.3f},", name]
+        if self._closed:
+            lines.append("#EXT-X-ENDLIST")
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
@@ -199,3 +199,16 @@ INPUT: {BRIEF}
 
 OUTPUT:
 '''
+
+# Map step of chunked summarization; the partial notes are merged with
+# INPUT2BRIEF afterwards.
+CHUNK2NOTES = '''
+### 任务说明
+下面是一篇长文档中的一个片段。请提取该片段中的全部关键信息，作为之后合并成完整总结的素材。
+- **文本要求**：
+    1. 直接输出结果，不要包含任何额外信息。
+    2. 用中文书写。允许少部分实体名词、专有名词、缩写等使用英文。
+    3. 不要修改原文的任何实体名词、专有名词、缩写等。除非有常见译名，否则不要翻译实体名词。
+    4. 保留标题、作者、研究问题、方法、实验结果、结论、重要引文及其论据，不要虚构原文没有的内容。
+    5. 片段内容不完整时，如实记录片段中出现的信息即可，不要猜测其他部分的内容。
+'''
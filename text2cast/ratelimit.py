@@ -0,0 +1,390 @@
+"""Adaptive per-provider rate limiting.
+
+Every provider (``tts:minimax``, ``chat:deepseek``, ...) gets one
+:class:`AdaptiveLimiter` per process, shared by all threads and by the
+coroutines on the runtime loop. The number of requests in flight follows an
+AIMD window: it grows by about one per window of successful requests and is
+halved when the provider signals throttling, after which no request starts
+until the ``Retry-After`` delay (or an exponential backoff) has passed. An
+optional token bucket caps the request rate.
+
+With a ``shared_dir`` the slots, the token bucket and the backoff are kept in
+lock files so several processes on the machine share one quota.
+"""
+
+import asyncio
+import email.utils
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from .config import Config, DEFAULT_CHAT_CONCURRENCY
+from . import trace
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 6
+MAX_BACKOFF = 60.0
+# How long a waiter sleeps before re-checking state that can change without
+# a notification, i.e. slots held by other processes.
+_POLL = 0.05
+
+
+class Throttled(Exception):
+    """Raised by engines when the provider rejected a request as rate limited."""
+
+    def __init__(self, message: str = "rate limited", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the delay in seconds of a ``Retry-After`` header value."""
+    if not value:
+        return None
+    value = value.strip()
+    if re.fullmatch(r"\d+(\.\d+)?", value):
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class _FileState:
+    """Slots, token bucket and backoff of a limiter kept in lock files."""
+
+    def __init__(self, directory: str, name: str):
+        os.makedirs(directory, exist_ok=True)
+        self._prefix = os.path.join(directory, re.sub(r"[^\w.-]", "_", name))
+
+    @contextmanager
+    def state(self, blocking: bool = True):
+        """Lock and yield the state dict, writing it back if it changed.
+
+        Without ``blocking``, raises ``BlockingIOError`` right away if
+        another process holds the lock.
+        """
+        with open(self._prefix + ".lock", "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                f.seek(0)
+                try:
+                    data = json.loads(f.read() or "{}")
+                except ValueError:
+                    data = {}
+                before = dict(data)
+                yield data
+                if data != before:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(data))
+                    f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire_slot(self, count: int):
+        """Lock one of ``count`` slot files, or return ``None`` if all are held.
+
+        The lock is released by the OS if the process dies, so crashed
+        processes never leak quota.
+        """
+        for i in range(count):
+            f = open(f"{self._prefix}.slot{i}", "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            return f
+        return None
+
+    @staticmethod
+    def release_slot(f) -> None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window with an optional token bucket."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        shared_dir: Optional[str] = None,
+    ):
+        self.name = name
+        self.ceiling = max(1, int(concurrency))
+        self.window = float(self.ceiling)
+        self.rate = float(rate) if rate else None
+        self.burst = float(burst or (rate and max(1.0, rate)) or 1)
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._backoff = 1.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._shared: Optional[_FileState] = None
+        if shared_dir:
+            if fcntl is None:
+                logger.warning("Cross-process rate limits need fcntl; ignoring")
+            else:
+                self._shared = _FileState(shared_dir, name)
+
+    def resize(self, concurrency: int) -> None:
+        """Change the ceiling of the concurrency window."""
+        with self._cond:
+            self.ceiling = max(1, int(concurrency))
+            self.window = min(self.window, float(self.ceiling))
+            self._notify()
+
+    # -- acquiring -------------------------------------------------------
+
+    def _take_token(self, now: float, state: dict) -> float:
+        """Take a token from the bucket or return how long to wait for one."""
+        if self.rate is None:
+            return 0.0
+        tokens = state.get("tokens", self.burst)
+        updated = state.get("updated", now)
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        state["updated"] = now
+        if tokens < 1:
+            state["tokens"] = tokens
+            return (1 - tokens) / self.rate
+        state["tokens"] = tokens - 1
+        return 0.0
+
+    def _try_acquire(self) -> Tuple[object, float]:
+        """Return ``(slot, 0)`` on success or ``(None, seconds to wait)``.
+
+        Must be called with the condition held. A shared state locked by
+        another process counts as busy instead of being waited for, so the
+        condition is never held across a blocking lock.
+        """
+        now = time.time()
+        if now < self._blocked_until:
+            return None, self._blocked_until - now
+        if self._in_flight >= int(self.window):
+            # Woken up by a release; the timeout only guards lost wake-ups.
+            return None, 1.0
+        if self._shared is None:
+            local = {"tokens": self._tokens, "updated": self._updated}
+            wait = self._take_token(now, local)
+            self._tokens, self._updated = local["tokens"], local["updated"]
+            if wait:
+                return None, wait
+            self._in_flight += 1
+            return True, 0.0
+        slot = self._shared.acquire_slot(int(self.window))
+        if slot is None:
+            return None, _POLL
+        try:
+            with self._shared.state(blocking=False) as state:
+                blocked = state.get("blocked_until", 0.0)
+                wait = blocked - now if blocked > now else self._take_token(now, state)
+        except BlockingIOError:
+            self._shared.release_slot(slot)
+            return None, _POLL
+        if wait:
+            self._shared.release_slot(slot)
+            return None, wait
+        self._in_flight += 1
+        return slot, 0.0
+
+    def acquire(self):
+        """Block until a request may start; returns a token for :meth:`release`."""
+        with self._cond:
+            while True:
+                slot, wait = self._try_acquire()
+                if slot is not None:
+                    return slot
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        """Coroutine version of :meth:`acquire`."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                slot, wait = self._try_acquire()
+                if slot is not None:
+                    return slot
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            try:
+                await asyncio.wait_for(future, wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    if (loop, future) in self._waiters:
+                        self._waiters.remove((loop, future))
+
+    # -- releasing -------------------------------------------------------
+
+    def release(self, slot, ok: bool = True, throttled: bool = False,
+                retry_after: Optional[float] = None) -> None:
+        """Return a slot and feed the outcome of the request into the window.
+
+        ``ok`` widens the window, ``throttled`` halves it (at most once per
+        backoff period, since the requests in flight are usually throttled
+        together) and pauses new requests. Other failures leave it unchanged.
+        The pause is written to the shared state after the condition is
+        released, since that can wait for another process; call this from an
+        executor when on the event loop with ``throttled`` set.
+        """
+        now = time.time()
+        blocked_until = None
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                delay = retry_after if retry_after is not None else self._backoff
+                self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+                if now - self._last_decrease > delay:
+                    self.window = max(1.0, self.window / 2)
+                    self._last_decrease = now
+                self._blocked_until = max(self._blocked_until, now + delay)
+                logger.warning(
+                    "%s throttled, window %.1f, pausing %.1fs",
+                    self.name, self.window, delay,
+                )
+                trace.event("throttled", "ratelimit", limiter=self.name, delay=delay)
+                blocked_until = now + delay
+            elif ok:
+                self._backoff = 1.0
+                self.window = min(float(self.ceiling), self.window + 1 / self.window)
+        if self._shared is not None:
+            # The pause is recorded before the slot is handed to another
+            # process.
+            if blocked_until is not None:
+                with self._shared.state() as state:
+                    state["blocked_until"] = max(
+                        state.get("blocked_until", 0.0), blocked_until
+                    )
+            self._shared.release_slot(slot)
+        with self._cond:
+            self._notify()
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_wake, future)
+        self._waiters.clear()
+
+    # -- helpers ---------------------------------------------------------
+
+    @contextmanager
+    def request(self):
+        """Hold a slot for the duration of the block."""
+        with trace.span("wait", "ratelimit", limiter=self.name):
+            slot = self.acquire()
+        try:
+            yield
+        except Throttled as e:
+            self.release(slot, ok=False, throttled=True, retry_after=e.retry_after)
+            raise
+        except BaseException:
+            self.release(slot, ok=False)
+            raise
+        self.release(slot)
+
+    @asynccontextmanager
+    async def request_async(self):
+        """Async version of :meth:`request`."""
+        with trace.span("wait", "ratelimit", limiter=self.name):
+            slot = await self.acquire_async()
+        try:
+            yield
+        except Throttled as e:
+            # Recording the backoff can wait for the shared state lock.
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    self.release, slot, ok=False, throttled=True,
+                    retry_after=e.retry_after,
+                ),
+            )
+            raise
+        except BaseException:
+            self.release(slot, ok=False)
+            raise
+        self.release(slot)
+
+    def call(self, fn: Callable[[], T], attempts: int = MAX_ATTEMPTS) -> T:
+        """Call ``fn`` in a slot, retrying when it raises :class:`Throttled`."""
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.request():
+                    return fn()
+            except Throttled:
+                if attempt == attempts:
+                    raise
+                trace.event("retry", "ratelimit", limiter=self.name, attempt=attempt)
+
+    async def call_async(
+        self, fn: Callable[[], Awaitable[T]], attempts: int = MAX_ATTEMPTS
+    ) -> T:
+        """Await ``fn()`` in a slot, retrying when it raises :class:`Throttled`."""
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.request_async():
+                    return await fn()
+            except Throttled:
+                if attempt == attempts:
+                    raise
+                trace.event("retry", "ratelimit", limiter=self.name, attempt=attempt)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_lock = threading.Lock()
+
+
+def get_limiter(cfg: Config, kind: str, provider: str) -> AdaptiveLimiter:
+    """Return the process-wide limiter for a ``tts`` or ``chat`` provider.
+
+    The limiter is created from the first config asking for it: the window
+    ceiling comes from ``rate_limits.<kind>.<provider>.concurrency`` and
+    defaults to ``max_concurrency`` for TTS providers.
+    """
+    name = f"{kind}:{provider}"
+    with _lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            opts = cfg.rate_limits.get(kind, {}).get(provider) or {}
+            default = cfg.max_concurrency if kind == "tts" else DEFAULT_CHAT_CONCURRENCY
+            limiter = AdaptiveLimiter(
+                name,
+                opts.get("concurrency", default),
+                rate=opts.get("rps"),
+                burst=opts.get("burst"),
+                shared_dir=cfg.rate_limit_dir,
+            )
+            logger.debug(
+                "Created rate limiter %s (concurrency %d, rps %s)",
+                name, limiter.ceiling, limiter.rate,
+            )
+            _limiters[name] = limiter
+        return limiter
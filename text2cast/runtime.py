@@ -0,0 +1,41 @@
+"""Process-wide asyncio loop used by the synchronous pipeline functions."""
+
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its thread on first use.
+
+    Running every coroutine on one long-lived loop lets async HTTP clients be
+    reused across pipeline steps and across episodes processed by different
+    threads.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="text2cast-runtime", daemon=True
+            )
+            thread.start()
+            logger.debug("Started runtime event loop")
+            _loop, _thread = loop, thread
+        return _loop
+
+
+def run(coro: Awaitable[T]) -> T:
+    """Run ``coro`` on the shared loop and block until it finishes."""
+    if threading.current_thread() is _thread:
+        raise RuntimeError("runtime.run() called from the runtime loop")
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
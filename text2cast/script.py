@@ -0,0 +1,254 @@
+"""Typed script entries and the JSON and JSONL script formats.
+
+A script is a sequence of entries: speech (``tts``), a pause (``silent``) or
+a sound effect (``sound_effect``). It is stored either as one JSON array or
+as JSON Lines with one entry per line. A JSONL script can be appended to
+while it is being produced and is read one line at a time, so long scripts
+never have to be held in memory.
+"""
+
+import json
+import logging
+import math
+import os
+from typing import IO, Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+
+class ScriptError(ValueError):
+    """Raised for a script or script entry that cannot be rendered."""
+
+
+class ScriptEntry:
+    """Base class of the script entries.
+
+    ``extra`` keeps the fields the entry type does not use (for example the
+    ``direction`` of a pause) so they survive a round trip.
+    """
+
+    __slots__ = ("extra",)
+    type = ""
+
+    def __init__(self, extra: Optional[dict] = None):
+        self.extra = dict(extra or {})
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, **self.extra}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ScriptEntry):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __hash__(self) -> int:
+        # Consistent with __eq__; nested lists and dicts in ``extra`` only
+        # contribute their type, so they need not be hashable.
+        items = []
+        for key, value in sorted(self.to_dict().items(), key=lambda kv: kv[0]):
+            try:
+                hash(value)
+            except TypeError:
+                value = type(value).__name__
+            items.append((key, value))
+        return hash(tuple(items))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SpeechEntry(ScriptEntry):
+    """A line of ``text`` spoken by ``speaker``."""
+
+    __slots__ = ("speaker", "text")
+    type = "tts"
+
+    def __init__(self, speaker: str, text: str, extra: Optional[dict] = None):
+        super().__init__(extra)
+        self.speaker = speaker
+        self.text = text
+
+    def to_dict(self) -> dict:
+        data = {"speaker": self.speaker, "text": self.text, "type": self.type}
+        return {**data, **self.extra}
+
+
+class SilentEntry(ScriptEntry):
+    """A pause of ``duration`` seconds."""
+
+    __slots__ = ("duration",)
+    type = "silent"
+
+    def __init__(self, duration: float = 1.0, extra: Optional[dict] = None):
+        super().__init__(extra)
+        self.duration = duration
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "duration": self.duration, **self.extra}
+
+
+class SoundEffectEntry(ScriptEntry):
+    """The audio clip at ``path``."""
+
+    __slots__ = ("path",)
+    type = "sound_effect"
+
+    def __init__(self, path: str, extra: Optional[dict] = None):
+        super().__init__(extra)
+        self.path = path
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "path": self.path, **self.extra}
+
+
+EntryLike = Union[ScriptEntry, dict]
+
+
+def parse_entry(data: EntryLike) -> ScriptEntry:
+    """Return the typed entry for a decoded script object.
+
+    Entries without a ``type`` are speech. Raises :class:`ScriptError` for
+    unknown types and missing or invalid fields.
+    """
+    if isinstance(data, ScriptEntry):
+        return data
+    if not isinstance(data, dict):
+        raise ScriptError(f"entry must be an object, not {type(data).__name__}")
+    fields = dict(data)
+    kind = fields.pop("type", None) or "tts"
+    if kind == "tts":
+        text = fields.pop("text", None)
+        if not isinstance(text, str) or not text.strip():
+            raise ScriptError("speech entry needs a non-empty text")
+        speaker = fields.pop("speaker", "0")
+        if isinstance(speaker, bool) or not isinstance(speaker, (str, int)):
+            raise ScriptError(f"invalid speaker {speaker!r}")
+        return SpeechEntry(str(speaker), text, fields)
+    if kind == "silent":
+        duration = fields.pop("duration", 1.0)
+        if (
+            isinstance(duration, bool)
+            or not isinstance(duration, (int, float))
+            or not math.isfinite(duration)
+            or duration <= 0
+        ):
+            raise ScriptError(f"invalid silence duration {duration!r}")
+        return SilentEntry(float(duration), fields)
+    if kind == "sound_effect":
+        path = fields.pop("path", None)
+        if not isinstance(path, str) or not path:
+            raise ScriptError("sound effect entry needs a path")
+        return SoundEffectEntry(path, fields)
+    raise ScriptError(f"unknown entry type {kind!r}")
+
+
+def is_jsonl(path: str) -> bool:
+    """Return whether ``path`` names a JSON Lines script."""
+    return os.path.splitext(path)[1].lower() in JSONL_SUFFIXES
+
+
+def _sniff_jsonl(f: IO[str]) -> bool:
+    # A JSON array starts with ``[``; anything else is read as JSON Lines.
+    while True:
+        ch = f.read(1)
+        if not ch or not ch.isspace():
+            f.seek(0)
+            return ch != "["
+
+
+def iter_script(path: str) -> Iterator[ScriptEntry]:
+    """Yield the entries of the script at ``path`` one by one.
+
+    JSON Lines scripts (by suffix, or any file not starting with ``[``) are
+    read a line at a time and blank lines are skipped; a JSON array is
+    loaded whole. Raises :class:`ScriptError` naming the line or entry that
+    is malformed.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if is_jsonl(path) or _sniff_jsonl(f):
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = parse_entry(json.loads(line))
+                except ValueError as e:
+                    raise ScriptError(f"{path}, line {number}: {e}") from None
+                yield entry
+            return
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ScriptError(f"{path}: script must be a JSON array")
+    for idx, item in enumerate(data):
+        try:
+            entry = parse_entry(item)
+        except ScriptError as e:
+            raise ScriptError(f"{path}, entry {idx}: {e}") from None
+        yield entry
+
+
+def load_script(path: str) -> List[ScriptEntry]:
+    """Return every entry of the script at ``path``."""
+    return list(iter_script(path))
+
+
+class ScriptWriter:
+    """Write script entries to ``path`` as they are produced.
+
+    JSONL scripts get every entry appended and flushed right away, so a
+    consumer can follow the file; with ``append`` an existing JSONL script
+    is extended instead of replaced. JSON scripts are written as one array
+    when the writer is closed, and not at all if the block that used the
+    writer raised.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.count = 0
+        self._entries: Optional[List[dict]] = []
+        self._file: Optional[IO[str]] = None
+        if is_jsonl(path):
+            self._file = open(path, "a" if append else "w", encoding="utf-8")
+        elif append:
+            raise ScriptError(f"{path}: only JSONL scripts can be appended to")
+
+    def write(self, entry: EntryLike) -> ScriptEntry:
+        """Add ``entry`` to the script and return it as a typed entry."""
+        entry = parse_entry(entry)
+        data = entry.to_dict()
+        if self._file is not None:
+            self._file.write(json.dumps(data, ensure_ascii=False) + "\n")
+            self._file.flush()
+        else:
+            self._entries.append(data)
+        self.count += 1
+        return entry
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._entries is not None:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        self._entries = None
+
+    def __enter__(self) -> "ScriptWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and self._file is None:
+            self._entries = None
+        self.close()
+
+
+def write_script(path: str, entries: Iterable[EntryLike]) -> List[dict]:
+    """Write ``entries`` to ``path``, as JSONL if its suffix says so.
+
+    Returns the entries as written.
+    """
+    with ScriptWriter(path) as writer:
+        written = [writer.write(entry).to_dict() for entry in entries]
+    logger.debug("Wrote %d script entries to %s", len(written), path)
+    return written
@@ -1,45 +1,63 @@
 from .prompts import BRIEF2SCRIPT
-from .config import Config, OPENAI_API_KEY, DEEPSEEK_API_KEY
-from .utils import wash_json
-import openai
+from .config import Config
+from .llm import complete, stream_complete
+from .script import ScriptEntry, ScriptWriter, write_script
+from .utils import iter_json_array, wash_json
+from . import trace
+from typing import Dict, Iterator, List
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def brief_to_script(cfg: Config) -> list:
+def _read_messages(cfg: Config) -> List[Dict[str, str]]:
     logger.debug("Reading brief from %s", cfg.brief_path)
     with open(cfg.brief_path, "r", encoding="utf-8") as f:
         text = f.read()
+    return [
+        {"role": "system", "content": BRIEF2SCRIPT},
+        {"role": "user", "content": text},
+    ]
+
 
-    logger.debug("Creating OpenAI client for script generation")
-    if cfg.chat_engine == "deepseek":
-        client = openai.OpenAI(
-            api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com"
-        )
-    else:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+def brief_to_script(cfg: Config) -> list:
+    messages = _read_messages(cfg)
 
     logger.debug("Sending script generation request")
-    resp = client.chat.completions.create(
-        model=cfg.model_script,
-        messages=[
-            {"role": "system", "content": BRIEF2SCRIPT},
-            {"role": "user", "content": text},
-        ],
-    )
-    script_text = resp.choices[0].message.content.strip()
+    script_text = complete(cfg, cfg.model_script, messages).strip()
     logger.debug("Received script text: %s", script_text)
 
     logger.debug("Is script_text a string? %s", isinstance(script_text, str))
 
     script = json.loads(wash_json(script_text))
-
-    # Ensure every entry has a type field for downstream processing
-    for item in script:
-        item.setdefault("type", "tts")
-
-    with open(cfg.script_path, "w", encoding="utf-8") as f:
-        json.dump(script, f, ensure_ascii=False, indent=2)
-    return script
+    if not isinstance(script, list):
+        raise ValueError("The completion is not a JSON array of script entries")
+
+    # Every entry is validated (and given a type) before the script is written.
+    with trace.span("write script", "file", entries=len(script)):
+        return write_script(cfg.script_path, script)
+
+
+def stream_script(cfg: Config) -> Iterator[ScriptEntry]:
+    """Yield script entries while the completion is still being generated.
+
+    Each ``{speaker, text}`` object is yielded as soon as it is complete, so
+    speech synthesis can start before the model finishes writing. A JSONL
+    ``cfg.script_path`` grows by one line per entry; a JSON script is
+    written once the stream ends.
+    """
+    messages = _read_messages(cfg)
+
+    logger.debug("Streaming script generation request")
+    deltas = stream_complete(cfg, cfg.model_script, messages)
+    with ScriptWriter(cfg.script_path) as writer:
+        for item in iter_json_array(deltas):
+            yield writer.write(item)
+        # Read the completion to its end so it is stored in the LLM cache.
+        for _ in deltas:
+            pass
+
+        if not writer.count:
+            raise ValueError("No script entries found in the completion")
+        logger.debug("Received %d script entries", writer.count)
@@ -1,12 +1,21 @@
 import json
 import logging
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from datetime import date
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-import openai
-from firecrawl import FirecrawlApp
+import requests
 
-from .config import Config, OPENAI_API_KEY, DEEPSEEK_API_KEY
+from .cache import make_key, open_cache
+from .config import Config
+from . import config as cfg_module
+from .llm import complete
+from .script import write_script
+from . import trace
 
 logger = logging.getLogger(__name__)
 
@@ -28,16 +37,13 @@ def urls_to_script(cfg: Config) -> List[Dict[str, str]]:
     if not global_articles and not local_articles:
         raise ValueError("No articles found in input file")
 
-    logger.debug("Creating Firecrawl client")
-    fc = FirecrawlApp()
+    from firecrawl import FirecrawlApp
 
-    logger.debug("Creating OpenAI client for summarization")
-    if cfg.chat_engine == "deepseek":
-        client = openai.OpenAI(
-            api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com"
-        )
+    logger.debug("Creating Firecrawl client")
+    if cfg_module.FIRECRAWL_API_URL:
+        fc = FirecrawlApp(api_url=cfg_module.FIRECRAWL_API_URL)
     else:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        fc = FirecrawlApp()
 
     script: List[Dict[str, str]] = []
 
@@ -59,24 +65,189 @@ def urls_to_script(cfg: Config) -> List[Dict[str, str]]:
     intro_path = cfg.sound_effects.get("intro", "intro.mp3")
     script.append({"type": "sound_effect", "path": intro_path})
 
+    articles = [("global", a) for a in global_articles]
+    articles += [("local", a) for a in local_articles]
+    summaries = _summarize_articles(cfg, fc, articles)
+
     speaker = 1
 
-    for article in global_articles:
+    for pos, ((_, article), summary) in enumerate(zip(articles, summaries)):
+        if pos == len(global_articles):
+            transition = cfg.sound_effects.get("transition", "transition.mp3")
+            script.append({"type": "sound_effect", "path": transition})
+
         title = article.get("title", "")
-        url = article.get("url")
-        logger.info("Processing %s", url)
+        if title:
+            script.append({"speaker": str(speaker), "text": title, "type": "tts"})
+            script.append({"type": "silent", "duration": 0.5, "direction": "after_title"})
+        if summary:
+            script.append({"speaker": str(speaker), "text": summary, "type": "tts"})
+        article_end = cfg.sound_effects.get("article_end", "article_end.mp3")
+        script.append({"type": "sound_effect", "path": article_end})
+        speaker = 1 if speaker == 2 else 2
+
+    script.append(
+        {
+            "speaker": str(speaker),
+            "text": "感谢您的收听，以上就是UU早报的全部内容，欢迎搜索订阅UU早晚报，晚上见。",
+            "type": "tts",
+        }
+    )
+    speaker = 1 if speaker == 2 else 2
+    script.append(
+        {
+            "speaker": str(speaker),
+            "text": "别走开，马上和你一起来了解不断飙升的日本大米价格……",
+            "type": "tts",
+        }
+    )
+    outro_path = cfg.sound_effects.get("outro", "outro.mp3")
+    script.append({"type": "sound_effect", "path": outro_path})
+
+    logger.debug("Writing script to %s", cfg.script_path)
+    return write_script(cfg.script_path, script)
+
+
+_TRACKING_PARAMS = ("fbclid", "gclid", "spm")
+
+
+def normalize_url(url: str) -> str:
+    """Return a canonical form of ``url`` used as the scrape cache key.
+
+    Scheme and host are lower-cased, default ports, fragments and tracking
+    parameters are dropped and the query is sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        netloc += f":{parts.port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.startswith("utm_") and k not in _TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+class ScrapeCache:
+    """Disk-backed cache of scraped article markdown keyed by normalized URL.
 
-        content = ""
+    Entries younger than ``cfg.scrape_cache_ttl`` seconds are used as-is.
+    Older entries are revalidated against the origin with one HEAD request:
+    a conditional one when the scrape metadata carried an ``ETag`` or
+    ``Last-Modified`` value, otherwise a plain one whose ``Last-Modified``
+    is compared with the time of the scrape. An unchanged page renews the
+    entry without scraping again. Nothing is requested while scraping.
+    """
+
+    def __init__(self, cfg: Config):
+        self._store = open_cache(cfg, "scrape", ".json")
+        self.ttl = cfg.scrape_cache_ttl
+        self.refresh = cfg.refresh_scrape
+        # Validators seen while revalidating a changed page, for its rescrape.
+        self._learned: Dict[str, Dict[str, str]] = {}
+
+    def get(self, url: str) -> Optional[str]:
+        if self._store is None or self.refresh:
+            return None
+        key = make_key(url=normalize_url(url))
+        path = self._store.get(key)
+        if not path:
+            return None
         try:
-            result = fc.scrape_url(url, formats=["markdown"])
-            content = result.markdown or ""
-        except Exception as e:
-            logger.warning("Failed to scrape %s: %s", url, e)
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable scrape cache entry %s: %s", path, e)
+            return None
+        if time.time() - entry.get("fetched_at", 0) <= self.ttl:
+            logger.debug("Scrape cache hit for %s", url)
+            return entry.get("markdown", "")
+        if self._revalidate(url, entry):
+            logger.debug("Scrape cache entry for %s revalidated", url)
+            entry["fetched_at"] = time.time()
+            self._write(key, entry)
+            return entry.get("markdown", "")
+        learned = {k: entry[k] for k in ("etag", "last_modified") if k in entry}
+        self._learned[normalize_url(url)] = learned
+        return None
 
-        summary = ""
-        if content:
+    def put(self, url: str, markdown: str, metadata=None) -> None:
+        """Store a scraped page; ``metadata`` is the scrape result's metadata."""
+        if self._store is None or not markdown:
+            return
+        entry = {"url": url, "markdown": markdown, "fetched_at": time.time()}
+        entry.update(self._learned.pop(normalize_url(url), {}))
+        entry.update(_validators(metadata))
+        try:
+            self._write(make_key(url=normalize_url(url)), entry)
+        except OSError as e:
+            logger.warning("Could not cache the scrape of %s: %s", url, e)
+
+    def _write(self, key: str, entry: dict) -> None:
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        self._store.put_bytes(key, data)
+
+    @staticmethod
+    def _revalidate(url: str, entry: dict) -> bool:
+        """Return whether the page is unchanged since ``entry`` was scraped.
+
+        Validators learned from the response are added to ``entry``.
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with trace.span("revalidate", "http"):
+                resp = requests.head(
+                    url, headers=headers, allow_redirects=True, timeout=10
+                )
+        except requests.RequestException as e:
+            logger.debug("Revalidating %s failed: %s", url, e)
+            return False
+        if resp.status_code == 304:
+            return True
+        if headers or resp.status_code >= 400:
+            return False
+        modified = resp.headers.get("Last-Modified")
+        if resp.headers.get("ETag"):
+            entry["etag"] = resp.headers["ETag"]
+        if modified:
+            entry["last_modified"] = modified
             try:
-                prompt = f"""
+                changed = parsedate_to_datetime(modified).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return changed <= entry.get("fetched_at", 0)
+        return False
+
+
+def _validators(metadata) -> Dict[str, str]:
+    """Return the HTTP validators found in a Firecrawl metadata object."""
+    if metadata is None:
+        return {}
+    if not isinstance(metadata, dict):
+        extra = getattr(metadata, "model_extra", None) or {}
+        metadata = {**getattr(metadata, "__dict__", {}), **extra}
+    validators = {}
+    for name, value in metadata.items():
+        if not value or not isinstance(value, str):
+            continue
+        plain = name.lower().replace("-", "").replace("_", "")
+        if plain == "etag":
+            validators["etag"] = value
+        elif plain == "lastmodified":
+            validators["last_modified"] = value
+    return validators
+
+
+def _summary_prompt(section: str, content: str) -> str:
+    if section == "local":
+        return f"请用中文用1-2句话总结这篇文章的主要内容：{content}"
+    return f"""
 #目标
 你是一名资深的日报编辑，尤其擅长将不论长短的资讯事件提炼要点，总结精准，帮助读者快速了解文章的内容，以确定是否需要继续阅读文章。
 
@@ -93,80 +264,100 @@ def urls_to_script(cfg: Config) -> List[Dict[str, str]]:
 #原文
 {content}
 """
-                resp = client.chat.completions.create(
-                    model=cfg.model_script,
-                    messages=[{"role": "user", "content": prompt}],
-                )
-                summary = resp.choices[0].message.content.strip()
-            except Exception as e:
-                logger.warning("Failed to summarize %s: %s", url, e)
 
-        if title:
-            script.append({"speaker": str(speaker), "text": title, "type": "tts"})
-            script.append({"type": "silent", "duration": 0.5, "direction": "after_title"})
-        if summary:
-            script.append({"speaker": str(speaker), "text": summary, "type": "tts"})
-        article_end = cfg.sound_effects.get("article_end", "article_end.mp3")
-        script.append({"type": "sound_effect", "path": article_end})
-        speaker = 1 if speaker == 2 else 2
 
-    if local_articles:
-        transition = cfg.sound_effects.get("transition", "transition.mp3")
-        script.append({"type": "sound_effect", "path": transition})
+def _field(obj, name: str):
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
 
-    for article in local_articles:
-        title = article.get("title", "")
-        url = article.get("url")
-        logger.info("Processing %s", url)
 
-        content = ""
-        try:
-            result = fc.scrape_url(url, formats=["markdown"])
-            content = result.markdown or ""
-        except Exception as e:
-            logger.warning("Failed to scrape %s: %s", url, e)
+def _batch_scrape(fc, urls: List[str]) -> Dict[str, Tuple[str, object]]:
+    """Scrape ``urls`` with one Firecrawl batch job when the SDK supports it.
+
+    Returns the markdown and metadata keyed by normalized source URL. URLs
+    missing from the result or returned without content are scraped
+    individually by the caller.
+    """
+    batch = getattr(fc, "batch_scrape_urls", None)
+    if batch is None or len(urls) < 2:
+        return {}
+    try:
+        with trace.span("batch scrape", "firecrawl", urls=len(urls)):
+            result = batch(urls, formats=["markdown"])
+    except Exception as e:
+        logger.warning("Batch scrape failed, falling back to single scrapes: %s", e)
+        return {}
+    contents = {}
+    for doc in _field(result, "data") or []:
+        metadata = _field(doc, "metadata") or {}
+        url = _field(metadata, "sourceURL") or _field(metadata, "url")
+        markdown = _field(doc, "markdown")
+        if url and markdown:
+            contents[normalize_url(url)] = (markdown, metadata)
+    logger.debug("Batch scrape returned %d of %d urls", len(contents), len(urls))
+    return contents
+
+
+def _summarize_articles(
+    cfg: Config, fc, articles: List[Tuple[str, Dict[str, str]]]
+) -> List[str]:
+    """Scrape and summarize all articles concurrently.
+
+    Returns the summaries in the order of ``articles``; an article that
+    cannot be scraped or summarized gets an empty summary.
+    """
+    urls = [article.get("url") for _, article in articles]
+    cache = ScrapeCache(cfg)
+    # Article content keyed by normalized URL, filled from the cache first.
+    scraped: Dict[str, str] = {}
+    for url in urls:
+        if url and normalize_url(url) not in scraped:
+            content = cache.get(url)
+            if content is not None:
+                scraped[normalize_url(url)] = content
+    missing = [u for u in dict.fromkeys(urls) if u and normalize_url(u) not in scraped]
+    batched: Dict[str, Tuple[str, object]] = {}
+    if cfg.batch_scrape and missing:
+        batched = _batch_scrape(fc, missing)
+        scraped.update((key, doc[0]) for key, doc in batched.items())
+    scrape_slots = threading.BoundedSemaphore(max(1, cfg.scrape_concurrency))
+    summary_slots = threading.BoundedSemaphore(max(1, cfg.summary_concurrency))
+
+    def process(section: str, url: str) -> str:
+        logger.info("Processing %s", url)
+        key = normalize_url(url) if url else None
+        content = scraped.get(key)
+        if key in batched:
+            cache.put(url, *batched[key])
+        if content is None:
+            content = ""
+            try:
+                with scrape_slots, trace.span("scrape", "firecrawl") as span:
+                    result = fc.scrape_url(url, formats=["markdown"])
+                    content = _field(result, "markdown") or ""
+                    span.set(bytes=len(content.encode("utf-8")))
+                cache.put(url, content, _field(result, "metadata"))
+            except Exception as e:
+                logger.warning("Failed to scrape %s: %s", url, e)
 
         summary = ""
         if content:
             try:
-                prompt = f"请用中文用1-2句话总结这篇文章的主要内容：{content}"
-                resp = client.chat.completions.create(
-                    model=cfg.model_script,
-                    messages=[{"role": "user", "content": prompt}],
-                )
-                summary = resp.choices[0].message.content.strip()
+                with summary_slots:
+                    summary = complete(
+                        cfg,
+                        cfg.model_script,
+                        [{"role": "user", "content": _summary_prompt(section, content)}],
+                    ).strip()
             except Exception as e:
                 logger.warning("Failed to summarize %s: %s", url, e)
+        return summary
 
-        if title:
-            script.append({"speaker": str(speaker), "text": title, "type": "tts"})
-            script.append({"type": "silent", "duration": 0.5, "direction": "after_title"})
-        if summary:
-            script.append({"speaker": str(speaker), "text": summary, "type": "tts"})
-        article_end = cfg.sound_effects.get("article_end", "article_end.mp3")
-        script.append({"type": "sound_effect", "path": article_end})
-        speaker = 1 if speaker == 2 else 2
-
-    script.append(
-        {
-            "speaker": str(speaker),
-            "text": "感谢您的收听，以上就是UU早报的全部内容，欢迎搜索订阅UU早晚报，晚上见。",
-            "type": "tts",
-        }
-    )
-    speaker = 1 if speaker == 2 else 2
-    script.append(
-        {
-            "speaker": str(speaker),
-            "text": "别走开，马上和你一起来了解不断飙升的日本大米价格……",
-            "type": "tts",
-        }
-    )
-    outro_path = cfg.sound_effects.get("outro", "outro.mp3")
-    script.append({"type": "sound_effect", "path": outro_path})
-
-    logger.debug("Writing script to %s", cfg.script_path)
-    with open(cfg.script_path, "w", encoding="utf-8") as f:
-        json.dump(script, f, ensure_ascii=False, indent=2)
-
-    return script
+    workers = max(1, cfg.scrape_concurrency, cfg.summary_concurrency)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(process, section, url)
+            for (section, _), url in zip(articles, urls)
+        ]
+        return [future.result() for future in futures]
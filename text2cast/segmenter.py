@@ -0,0 +1,103 @@
+"""Split script text into TTS-sized requests and plan coalesced requests.
+
+Long entries are cut at Chinese or English sentence boundaries into chunks
+that fit the engine's request size; short adjacent entries of one speaker
+can be sent as one request when the engine reports timestamps that allow the
+audio to be cut apart again.
+"""
+
+import re
+import unicodedata
+from typing import List, Optional, Sequence
+
+# Sentence ends, including closing quotes or brackets that follow them.
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;…])[”’」』）)\]]*\s*|(?<=[.])\s+")
+_CLAUSE_END = re.compile(r"(?<=[，,、：:])\s*")
+
+
+def _split_with(pattern: re.Pattern, text: str) -> List[str]:
+    pieces, start = [], 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return [p for p in pieces if p.strip()]
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split ``text`` into chunks of at most ``max_chars`` characters.
+
+    Sentences are packed greedily; a sentence that is too long on its own is
+    split at clause punctuation and, as a last resort, at ``max_chars``.
+    """
+    text = text.strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text] if text else []
+    units: List[str] = []
+    for sentence in _split_with(_SENTENCE_END, text):
+        if len(sentence) <= max_chars:
+            units.append(sentence)
+            continue
+        for clause in _split_with(_CLAUSE_END, sentence):
+            while len(clause) > max_chars:
+                units.append(clause[:max_chars])
+                clause = clause[max_chars:]
+            units.append(clause)
+    chunks: List[str] = []
+    for unit in units:
+        if chunks and len(chunks[-1]) + len(unit) <= max_chars:
+            chunks[-1] += unit
+        else:
+            chunks.append(unit)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def can_coalesce(group: Sequence[str], text: str, short_chars: int, max_chars: int) -> bool:
+    """Whether ``text`` may join the coalesced request ``group``."""
+    if len(text) > short_chars:
+        return False
+    return sum(len(t) + 1 for t in group) + len(text) <= max_chars
+
+
+def _letters(text: str) -> str:
+    """Characters that are spoken, i.e. without punctuation and spaces."""
+    return "".join(
+        ch.lower()
+        for ch in text
+        if not unicodedata.category(ch).startswith(("P", "Z", "S", "C"))
+    )
+
+
+def align_boundaries(texts: Sequence[str], words: Sequence[dict]) -> Optional[List[float]]:
+    """Return the cut times between ``texts`` spoken in one request.
+
+    ``words`` are the engine's word timestamps (``word``, ``start_time`` and
+    ``end_time`` in seconds) in reading order. Each cut lies in the middle of
+    the pause between the last word of one text and the first word of the
+    next. Returns ``None`` when the words cannot be matched to the texts.
+    """
+    targets = [_letters(t) for t in texts]
+    if not all(targets):
+        return None
+    cuts: List[float] = []
+    index, consumed, last_end = 0, 0, 0.0
+    for word in words:
+        spoken = _letters(str(word.get("word", "")))
+        if not spoken:
+            continue
+        if index >= len(targets):
+            return None
+        if consumed == len(targets[index]):
+            cuts.append((last_end + float(word["start_time"])) / 2)
+            index, consumed = index + 1, 0
+            if index >= len(targets):
+                return None
+        if not targets[index].startswith(spoken, consumed):
+            return None
+        consumed += len(spoken)
+        last_end = float(word["end_time"])
+    if index != len(targets) - 1 or consumed != len(targets[index]):
+        return None
+    return cuts
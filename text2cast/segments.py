@@ -0,0 +1,120 @@
+"""Per-episode record of the finished audio segments.
+
+Every rendered script entry is stored in the audio directory under a name
+derived from its content (speaker, text, engine settings and output
+profile) rather than its position, so inserting or reordering lines keeps
+the files of the others. The manifest lists each finished segment with its
+file, checksum and source entry; a rerun reuses every segment whose file is
+intact and renders only the missing or changed ones.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from .cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MANIFEST_NAME = ".text2cast_segments.json"
+
+
+class SegmentManifest:
+    """Finished segments of one episode, persisted as JSON and rewritten atomically.
+
+    While rendering, the file is rewritten at most every ``interval``
+    seconds; :meth:`save` writes any pending changes. A segment missing from
+    the file after a crash is rendered again (usually from the segment
+    cache), so the interval only bounds the work that may be repeated.
+    """
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        self.directory = directory
+        self.path = os.path.join(directory, SEGMENT_MANIFEST_NAME)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._saved = 0.0
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.segments: Dict[str, dict] = json.load(f).get("segments", {})
+        except FileNotFoundError:
+            self.segments = {}
+        except ValueError as e:
+            logger.warning("Ignoring unreadable segment manifest %s: %s", self.path, e)
+            self.segments = {}
+
+    def lookup(self, segment_id: str) -> Optional[str]:
+        """Return the path of a finished segment whose file is intact."""
+        with self._lock:
+            record = self.segments.get(segment_id)
+        if not record:
+            return None
+        path = os.path.join(self.directory, record["file"])
+        try:
+            intact = file_digest(path) == record.get("sha256")
+        except OSError:
+            intact = False
+        if not intact:
+            logger.debug("Segment %s is missing or damaged", record["file"])
+            return None
+        return path
+
+    def record(self, segment_id: str, path: str, entry: dict, index: int) -> None:
+        """Add a finished segment; ``entry`` is the script entry at ``index``."""
+        record = {
+            "file": os.path.relpath(path, self.directory),
+            "sha256": file_digest(path),
+            "bytes": os.path.getsize(path),
+            "index": index,
+            "entry": entry,
+            "finished_at": time.time(),
+        }
+        with self._lock:
+            self.segments[segment_id] = record
+            self._dirty = True
+            if time.monotonic() - self._saved >= self.interval:
+                self._write()
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Forget the segments not in ``keep`` and delete their files.
+
+        Returns the number of removed segments.
+        """
+        keep = set(keep)
+        with self._lock:
+            stale = [sid for sid in self.segments if sid not in keep]
+            kept_files = {
+                rec["file"] for sid, rec in self.segments.items() if sid in keep
+            }
+            for sid in stale:
+                name = self.segments.pop(sid)["file"]
+                if name not in kept_files:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass
+            if stale:
+                self._dirty = True
+        if stale:
+            logger.debug(
+                "Removed %d stale segments from %s", len(stale), self.directory
+            )
+        return len(stale)
+
+    def save(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._write()
+
+    def _write(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": self.segments}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        self._saved = time.monotonic()
+        self._dirty = False
@@ -1,34 +1,144 @@
-from .prompts import INPUT2BRIEF
-from .config import Config, OPENAI_API_KEY, DEEPSEEK_API_KEY
-import openai
+from .prompts import CHUNK2NOTES, INPUT2BRIEF
+from .config import Config
+from .llm import complete
+from . import trace
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 import logging
+import re
+import zlib
 
 logger = logging.getLogger(__name__)
 
+_CJK = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# Markdown headings and numbered ones like "2." or "3.1)".
+_HEADING = re.compile(r"^(#{1,6}\s|\d+(\.\d+)*[.)]\s+\S|[IVX]+\.\s)")
+_SENTENCE = re.compile(r"(?<=[。！？!?；;.])\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: one token per CJK character, four chars otherwise."""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _sections(text: str) -> List[str]:
+    """Split ``text`` into sections, or paragraphs when there are no headings."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    sections: List[str] = []
+    for para in paragraphs:
+        if sections and _HEADING.match(sections[-1]) and not _HEADING.match(para):
+            sections[-1] += "\n\n" + para
+        else:
+            sections.append(para)
+    return sections
+
+
+def _units(block: str) -> List[str]:
+    """Split an oversized block into paragraphs, sentences or fixed slices."""
+    paragraphs = block.split("\n\n")
+    if len(paragraphs) > 1:
+        return paragraphs
+    sentences = [s for s in _SENTENCE.split(block) if s]
+    if len(sentences) > 1:
+        return sentences
+    half = len(block) // 2
+    return [block[:half], block[half:]]
+
+
+def _pack(blocks: List[str], max_tokens: int) -> List[str]:
+    chunks: List[str] = []
+    current = ""
+    for block in blocks:
+        if estimate_tokens(block) > max_tokens and len(block) > 1:
+            parts = _pack(_units(block), max_tokens)
+        else:
+            parts = [block]
+        for part in parts:
+            if current and estimate_tokens(current) + estimate_tokens(part) > max_tokens:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _is_cut(block: str, target: int) -> bool:
+    # Cut after a block with a chance proportional to its size, decided by a
+    # hash of its text, so chunks average ``target`` tokens and the same
+    # blocks end a chunk wherever they appear in the document.
+    share = min(1.0, estimate_tokens(block) / target)
+    return zlib.crc32(block.encode("utf-8")) < share * 0xFFFFFFFF
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split ``text`` into chunks of at most ``max_tokens`` estimated tokens.
+
+    Sections (or paragraphs) are packed together, and long ones split at
+    paragraphs and sentences. Chunks end at blocks chosen by their content
+    rather than their position, so an edit in one section changes the
+    chunks around it and leaves the others unchanged.
+    """
+    target = max(1, max_tokens // 2)
+    chunks: List[str] = []
+    current = ""
+    for section in _sections(text):
+        for block in _pack([section], max_tokens):
+            if current and estimate_tokens(current) + estimate_tokens(block) > max_tokens:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{block}" if current else block
+            if _is_cut(block, target):
+                chunks.append(current)
+                current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _map_chunks(cfg: Config, chunks: List[str]) -> List[str]:
+    # The prompt does not depend on the chunk's position, so the cached notes
+    # of an unchanged chunk are reused wherever it ends up in the document.
+    def summarize(chunk: str) -> str:
+        return complete(
+            cfg,
+            cfg.model_summary,
+            [
+                {"role": "system", "content": CHUNK2NOTES},
+                {"role": "user", "content": chunk},
+            ],
+        ).strip()
+
+    workers = max(1, min(cfg.summary_chunk_concurrency, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(summarize, chunks))
+
 
 def input_to_brief(cfg: Config) -> str:
     logger.debug("Reading input text from %s", cfg.input_path)
     with open(cfg.input_path, 'r', encoding='utf-8') as f:
         text = f.read()
 
-    logger.debug("Creating OpenAI client for summarization")
-    if cfg.chat_engine == "deepseek":
-        client = openai.OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
+    if cfg.summary_chunk_tokens and estimate_tokens(text) > cfg.summary_chunk_tokens:
+        chunks = split_into_chunks(text, cfg.summary_chunk_tokens)
+        logger.debug("Summarizing input in %d chunks", len(chunks))
+        notes = _map_chunks(cfg, chunks)
+        # The reduce pass merges the partial notes into the structured brief.
+        text = "\n\n".join(
+            f"[第{i + 1}部分]\n{note}" for i, note in enumerate(notes)
         )
-    else:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
     logger.debug("Sending summarization request")
-    resp = client.chat.completions.create(
-        model=cfg.model_summary,
-        messages=[{"role": "system", "content": INPUT2BRIEF}, {"role": "user", "content": text}],
-    )
-    brief = resp.choices[0].message.content.strip()
+    brief = complete(
+        cfg,
+        cfg.model_summary,
+        [{"role": "system", "content": INPUT2BRIEF}, {"role": "user", "content": text}],
+    ).strip()
     logger.debug("Received summary with %d characters", len(brief))
 
     logger.debug("Writing summary to %s", cfg.brief_path)
-    with open(cfg.brief_path, 'w', encoding='utf-8') as f:
-        f.write(brief)
+    with trace.span("write brief", "file", bytes=len(brief.encode("utf-8"))):
+        with open(cfg.brief_path, 'w', encoding='utf-8') as f:
+            f.write(brief)
     return brief
@@ -0,0 +1,204 @@
+"""Lightweight timing spans for profiling a run.
+
+Tracing is off by default and :func:`span` then costs a function call. Once
+:func:`enable` was called every span is recorded with its duration, thread
+and attributes (bytes, model, ...). :func:`write` stores the spans in the
+Chrome trace event format, which is plain JSON and opens in
+``chrome://tracing`` or Perfetto, and :func:`format_summary` aggregates them
+per category and name.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+_enabled = False
+_events: List[dict] = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+class Span:
+    __slots__ = ("attrs",)
+
+    def __init__(self):
+        self.attrs: Dict[str, object] = {}
+
+    def set(self, **attrs) -> None:
+        """Attach attributes such as ``bytes`` to the span."""
+        self.attrs.update(attrs)
+
+    def add(self, name: str, amount: int = 1) -> None:
+        """Increase the counter attribute ``name``."""
+        self.attrs[name] = self.attrs.get(name, 0) + amount
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def add(self, name: str, amount: int = 1) -> None:
+        pass
+
+
+_NULL = _NullSpan()
+
+
+def enable() -> None:
+    """Start recording spans."""
+    global _enabled, _origin
+    with _lock:
+        _enabled = True
+        _origin = time.perf_counter()
+        _events.clear()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _lane() -> Tuple[str, int]:
+    # Coroutines on the runtime loop overlap on one thread; giving every task
+    # its own lane keeps the trace viewer's per-thread nesting intact. No
+    # task can run before asyncio was imported, so importing it is left to
+    # the code that needs it.
+    asyncio = sys.modules.get("asyncio")
+    task = None
+    if asyncio is not None:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            pass
+    if task is not None:
+        return f"task {id(task):x}", id(task)
+    thread = threading.current_thread()
+    return thread.name, thread.ident or 0
+
+
+@contextmanager
+def span(name: str, category: str, **attrs):
+    """Time the block as ``name`` in ``category`` (``stage``, ``tts``, ...)."""
+    if not _enabled:
+        yield _NULL
+        return
+    current = Span()
+    current.attrs.update(attrs)
+    lane, tid = _lane()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - _origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": tid,
+            "args": dict(current.attrs, lane=lane),
+        }
+        with _lock:
+            _events.append(event)
+
+
+def event(name: str, category: str, **attrs) -> None:
+    """Record an instant event, e.g. a throttled request."""
+    if not _enabled:
+        return
+    lane, tid = _lane()
+    with _lock:
+        _events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "i",
+                "s": "t",
+                "ts": round((time.perf_counter() - _origin) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": dict(attrs, lane=lane),
+            }
+        )
+
+
+def events() -> List[dict]:
+    with _lock:
+        return list(_events)
+
+
+def write(path: str) -> None:
+    """Write the recorded events as a Chrome trace JSON file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"traceEvents": events(), "displayTimeUnit": "ms"},
+            f,
+            ensure_ascii=False,
+            default=str,
+        )
+
+
+def summarize(recorded: Optional[List[dict]] = None) -> List[dict]:
+    """Aggregate spans and instant events per category and name.
+
+    The run and its stages come first, the rest by descending total time.
+    """
+    rows: Dict[Tuple[str, str], dict] = {}
+    for e in events() if recorded is None else recorded:
+        row = rows.setdefault(
+            (e["cat"], e["name"]),
+            {"category": e["cat"], "name": e["name"], "count": 0, "events": 0,
+             "total": 0.0, "max": 0.0, "bytes": 0, "errors": 0},
+        )
+        args = e.get("args", {})
+        if e["ph"] != "X":
+            row["events"] += 1
+            continue
+        seconds = e["dur"] / 1e6
+        row["count"] += 1
+        row["total"] += seconds
+        row["max"] = max(row["max"], seconds)
+        row["bytes"] += int(args.get("bytes", 0) or 0)
+        row["errors"] += 1 if "error" in args else 0
+    order = {"run": 0, "stage": 1}
+    return sorted(
+        rows.values(), key=lambda r: (order.get(r["category"], 2), -r["total"])
+    )
+
+
+def format_summary(recorded: Optional[List[dict]] = None) -> str:
+    """Return the summary as a plain-text table.
+
+    ``count`` are timed spans, ``events`` instant events such as cache hits,
+    retries or skipped stages. Totals of concurrent spans overlap, so they
+    can exceed the wall time.
+    """
+    columns = ("category", "name", "count", "events", "total s", "mean s",
+               "max s", "bytes", "errors")
+    widths = (10, 24, 6, 6, 9, 8, 8, 12, 6)
+    header = " ".join(
+        c.ljust(w) if i < 2 else c.rjust(w)
+        for i, (c, w) in enumerate(zip(columns, widths))
+    )
+    lines = [header, "-" * len(header)]
+    for r in summarize(recorded):
+        mean = r["total"] / r["count"] if r["count"] else 0.0
+        lines.append(
+            f"{r['category']:<10} {r['name'][:24]:<24} {r['count']:>6} "
+            f"{r['events']:>6} {r['total']:>9.2f} {mean:>8.3f} {r['max']:>8.3f} "
+            f"{r['bytes']:>12} {r['errors']:>6}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+"""Pool of ffmpeg processes transcoding audio over pipes.
+
+ffmpeg handles one stream per process, so a worker cannot be reused for a
+second job. Instead the pool keeps processes that are already started and
+waiting on stdin; taking one spawns its replacement, so the start-up cost of
+ffmpeg overlaps the current job instead of preceding the next one. Audio
+goes in and out through pipes, without temporary files. At most
+``workers`` transcodes (by default one per CPU) run at a time.
+"""
+
+import atexit
+import logging
+import os
+import subprocess
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .config import Config
+from . import trace
+
+logger = logging.getLogger(__name__)
+
+TARGET_RATE = 44100  # output sample-rate (Hz)
+TARGET_CH = 2        # channels (1 = mono, 2 = stereo)
+BITRATE = 192        # average bitrate (kbps)
+
+FORMATS = ("mp3", "pcm")
+
+
+class AudioFormat(NamedTuple):
+    """Audio an engine can return.
+
+    ``codec`` is ``mp3`` or ``pcm`` (raw signed 16-bit little-endian
+    samples, which carry no header and need ``rate`` and ``channels`` to be
+    decoded). ``bitrate`` is the MP3 bitrate in kbps, or 0 if unknown.
+    """
+
+    codec: str
+    rate: int
+    channels: int = 1
+    bitrate: int = 0
+
+    @property
+    def suffix(self) -> str:
+        return "." + self.codec
+
+    def matches_output(self) -> bool:
+        return (
+            self.codec == "mp3"
+            and self.rate == TARGET_RATE
+            and self.channels == TARGET_CH
+            and self.bitrate == BITRATE
+        )
+
+
+def _cost(fmt: AudioFormat) -> Tuple[int, int]:
+    # MP3 in the output profile is copied as-is; PCM is encoded once, without
+    # a decode or a second lossy pass; any other MP3 is decoded, resampled
+    # and encoded again. Among equals the higher sample rate wins.
+    if fmt.matches_output():
+        rank = 0
+    elif fmt.codec == "pcm":
+        rank = 1
+    else:
+        rank = 2
+    return rank, -fmt.rate
+
+
+def choose_format(
+    formats: Sequence[AudioFormat], codec: Optional[str] = None
+) -> Optional[AudioFormat]:
+    """Return the format of ``formats`` that is cheapest to bring to the output.
+
+    ``codec`` restricts the choice to one codec. Returns ``None`` if no
+    format qualifies.
+    """
+    candidates = [f for f in formats if codec is None or f.codec == codec]
+    return min(candidates, key=_cost) if candidates else None
+
+
+def _command(fmt: str, source: Optional[AudioFormat] = None) -> List[str]:
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if source is not None and source.codec == "pcm":
+        cmd += ["-f", "s16le", "-ar", str(source.rate), "-ac", str(source.channels)]
+    cmd += [
+        "-i",
+        "pipe:0",
+        "-ar",
+        str(TARGET_RATE),
+        "-ac",
+        str(TARGET_CH),
+    ]
+    if fmt == "pcm":
+        cmd += ["-f", "s16le"]
+    else:
+        # No Xing header: the segments are concatenated frame by frame.
+        cmd += ["-b:a", f"{BITRATE}k", "-write_xing", "0", "-f", "mp3"]
+    return cmd + ["pipe:1"]
+
+
+class TranscoderPool:
+    """Transcode audio bytes to the target profile with warm ffmpeg processes."""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._idle: Dict[Tuple[str, Optional[AudioFormat]], List[subprocess.Popen]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self, fmt: str, source: Optional[AudioFormat]) -> subprocess.Popen:
+        return subprocess.Popen(
+            _command(fmt, source),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def _take(self, fmt: str, source: Optional[AudioFormat]) -> subprocess.Popen:
+        with self._lock:
+            idle = self._idle.setdefault((fmt, source), [])
+            proc = None
+            while idle and proc is None:
+                candidate = idle.pop()
+                if candidate.poll() is None:
+                    proc = candidate
+            if proc is None:
+                proc = self._spawn(fmt, source)
+            if not self._closed and len(idle) < self.workers:
+                idle.append(self._spawn(fmt, source))
+        return proc
+
+    def transcode(
+        self, data: bytes, fmt: str = "mp3", source: Optional[AudioFormat] = None
+    ) -> bytes:
+        """Return ``data`` in the target profile.
+
+        ``fmt`` is ``mp3`` (CBR at ``BITRATE``) or ``pcm`` (signed 16-bit
+        little-endian samples). ``source`` describes raw PCM input; any
+        other input is detected by ffmpeg.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        with self._slots:
+            proc = self._take(fmt, source)
+            with trace.span("transcode", "ffmpeg", format=fmt) as span:
+                out, err = proc.communicate(data)
+                span.set(bytes=len(out))
+        if proc.returncode != 0:
+            message = err.decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {message}")
+        return out
+
+    def transcode_file(
+        self,
+        input_path: str,
+        output_path: str,
+        fmt: str = "mp3",
+        source: Optional[AudioFormat] = None,
+    ) -> None:
+        """Transcode ``input_path`` into ``output_path`` (which may be the same).
+
+        The output is written to a ``.part`` file first, so a failed
+        transcode never leaves a truncated file behind.
+        """
+        with open(input_path, "rb") as f:
+            data = f.read()
+        out = self.transcode(data, fmt, source)
+        tmp = output_path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(out)
+        os.replace(tmp, output_path)
+
+    def close(self) -> None:
+        """Stop the idle processes."""
+        with self._lock:
+            self._closed = True
+            procs = [p for idle in self._idle.values() for p in idle]
+            self._idle.clear()
+        for proc in procs:
+            proc.kill()
+            proc.communicate()
+
+
+_pool: Optional[TranscoderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(cfg: Optional[Config] = None) -> TranscoderPool:
+    """Return the process-wide pool.
+
+    The pool is sized by ``transcode.workers`` of the first config asking
+    for it, and defaults to the CPU count.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscoderPool(cfg.transcode_workers if cfg else None)
+            logger.debug("Created transcoder pool with %d workers", _pool.workers)
+            atexit.register(_pool.close)
+        return _pool
@@ -1,242 +1,974 @@
 import os
-import uuid
-import base64
-import requests
-import time
+import asyncio
 import subprocess
+from .cache import DiskCache, file_digest, link_or_copy, make_key, open_cache
 from .config import Config
-from . import config as cfg_module
-import openai
+from .engines import TTSEngine, create_engine, iter_audio
+from . import mp3
+from .progressive import ProgressivePlaylist
+from .ratelimit import AdaptiveLimiter, get_limiter
+from .script import (
+    EntryLike,
+    ScriptEntry,
+    ScriptError,
+    SilentEntry,
+    SoundEffectEntry,
+    SpeechEntry,
+    is_jsonl,
+    iter_script,
+    load_script,
+    parse_entry,
+)
+from .segmenter import can_coalesce, split_text
+from .segments import SegmentManifest
+from . import runtime
+from . import trace
+from .transcode import (
+    BITRATE,
+    TARGET_CH,
+    TARGET_RATE,
+    AudioFormat,
+    TranscoderPool,
+    choose_format,
+    get_pool,
+)
 import logging
-import shutil
+import threading
+from typing import AsyncIterator, Awaitable, Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-TARGET_RATE = 44100  # output sample-rate (Hz)
-TARGET_CH = 2        # channels (1 = mono, 2 = stereo)
-BITRATE = 192        # average bitrate (kbps)
+# Subdirectory of the audio directory holding the progressive output.
+PROGRESSIVE_DIR = "live"
+
+
+def normalize_audio(
+    input_path: str, output_path: str, pool: Optional[TranscoderPool] = None
+) -> None:
+    """Transcode ``input_path`` to the target format, keeping the source."""
+    (pool or get_pool()).transcode_file(input_path, output_path)
 
 
 def convert_audio(input_path: str, output_path: str) -> None:
-    """Convert audio file to the target format using ffmpeg."""
-    tmp_path = output_path + ".tmp"
-    if input_path != tmp_path:
-        os.rename(input_path, tmp_path)
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        tmp_path,
-        "-ar",
-        str(TARGET_RATE),
-        "-ac",
-        str(TARGET_CH),
-        "-b:a",
-        f"{BITRATE}k",
-        output_path,
-    ]
-    subprocess.run(cmd, check=True)
-    os.remove(tmp_path)
+    """Convert an audio file to the target format, replacing the source."""
+    normalize_audio(input_path, output_path)
+    if input_path != output_path:
+        os.remove(input_path)
+
+
+class AssetStore:
+    """Normalized copies of local audio clips such as sound effects.
+
+    Each distinct clip is transcoded to the target profile once and then
+    served from disk. Entries are keyed by the content hash of the source
+    and the output profile; the hash itself is memoized per path, size and
+    mtime so unchanged clips are not re-read.
+    """
+
+    def __init__(self, cfg: Config):
+        store = open_cache(cfg, "assets", ".mp3")
+        if store is None:
+            store = DiskCache(os.path.join(cfg.audio_dir, ".assets"), suffix=".mp3")
+        self._store = store
+        self._pool = get_pool(cfg)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def normalized(self, path: str) -> str:
+        """Return the path of the normalized copy of ``path``."""
+        key = make_key(
+            source=file_digest(path), profile=[TARGET_RATE, TARGET_CH, BITRATE]
+        )
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent entries using the same clip wait for a single transcode.
+        with key_lock:
+            cached = self._store.get(key)
+            if cached:
+                return cached
+            logger.debug("Normalizing asset %s", path)
+            tmp = self._store.tmp_path(key)
+            try:
+                normalize_audio(path, tmp, self._pool)
+                return self._store.adopt(key, tmp)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
 
 
 def generate_silence(output_path: str, duration: float) -> None:
-    """Generate a silent MP3 file of the given duration."""
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-f",
-        "lavfi",
-        "-i",
-        f"anullsrc=r={TARGET_RATE}:cl=stereo",
-        "-t",
-        str(duration),
-        "-ac",
-        str(TARGET_CH),
-        "-b:a",
-        f"{BITRATE}k",
-        output_path,
-    ]
-    subprocess.run(cmd, check=True)
+    """Write a silent MP3 file of the given duration.
 
+    The frames are synthesized in-process at the target profile and memoized
+    per duration, so no ffmpeg process is started for gaps.
+    """
+    data = mp3.silence(duration, TARGET_RATE, TARGET_CH, BITRATE)
+    with trace.span("silence", "file", bytes=len(data)), open(output_path, "wb") as f:
+        f.write(data)
 
-def script_to_audio(cfg: Config) -> list:
-    import json
 
-    logger.debug("Reading script JSON from %s", cfg.script_path)
-    with open(cfg.script_path, "r", encoding="utf-8") as f:
-        script = json.load(f)
+def segment_key(engine: TTSEngine, voice: str, text: str) -> str:
+    """Return the segment cache key for ``text`` spoken by ``voice``."""
+    return make_key(
+        engine=engine.name,
+        model=engine.model,
+        voice=voice,
+        text=text,
+        settings=engine.settings(),
+    )
 
-    logger.debug("Ensuring audio directory %s exists", cfg.audio_dir)
-    os.makedirs(cfg.audio_dir, exist_ok=True)
 
-    audio_files = []
-
-    if cfg.tts_engine == "openai":
-        logger.debug("Creating OpenAI client for TTS")
-        client = openai.OpenAI(api_key=cfg_module.OPENAI_API_KEY)
-    elif cfg.tts_engine == "volcengine":
-        logger.debug("Using Volcengine HTTP API for TTS")
-        client = None
-        if not cfg_module.VOLCENGINE_TOKEN or not cfg_module.VOLCENGINE_APP_ID:
-            raise ValueError("VOLCENGINE_TOKEN or VOLCENGINE_APP_ID not set")
-    elif cfg.tts_engine == "minimax":
-        logger.debug("Using Minimax HTTP API for TTS")
-        client = None
-        if not cfg_module.MINIMAX_API_KEY or not cfg_module.MINIMAX_GROUP_ID:
-            raise ValueError("MINIMAX_API_KEY or MINIMAX_GROUP_ID not set")
-    else:
-        raise ValueError(f"Unknown tts_engine: {cfg.tts_engine}")
+def output_key(cfg: Config, engine: TTSEngine, voice: str, text: str) -> str:
+    """Return the segment cache key of a line's audio in the output profile."""
+    return make_key(
+        segment=segment_key(engine, voice, text),
+        max_chars=_max_chars(cfg, engine),
+        profile=[TARGET_RATE, TARGET_CH, BITRATE],
+    )
 
-    logger.debug("speaker_voice: %s", cfg.speaker_voice)
 
-    for idx, item in enumerate(script):
-        if item.get("type") == "sound_effect":
-            se_path = item.get("path")
-            if not os.path.isabs(se_path):
-                se_path = os.path.join(cfg.audio_dir, se_path)
-            if not os.path.exists(se_path):
-                logger.warning("Sound effect %s does not exist", se_path)
-            ext = os.path.splitext(se_path)[1]
-            out_path = os.path.join(cfg.audio_dir, f"{idx}_sound_effect{ext}")
-            try:
-                shutil.copy2(se_path, out_path)
-            except Exception as e:  # pragma: no cover - just log
-                logger.warning("Failed to copy %s to %s: %s", se_path, out_path, e)
-                out_path = se_path
-            convert_audio(out_path, out_path)
-            audio_files.append(out_path)
-            continue
-        if item.get("type") == "silent":
-            duration = float(item.get("duration", 1))
-            out_path = os.path.join(cfg.audio_dir, f"{idx}_silent.mp3")
-            generate_silence(out_path, duration)
-            audio_files.append(out_path)
+def _output_cache(cfg: Config) -> Optional[DiskCache]:
+    # Normalized audio is always MP3, whatever the engine returns.
+    return open_cache(cfg, "segments", ".mp3")
+
+
+def _reuse_output(cfg: Config, key: Optional[str], out_path: str) -> bool:
+    """Place the cached normalized audio for ``key`` at ``out_path``."""
+    store = _output_cache(cfg) if key else None
+    cached = store.get(key) if store is not None else None
+    if not cached:
+        return False
+    logger.debug("Normalized segment cache hit for %s", out_path)
+    trace.event("segment cache hit", "tts", normalized=True)
+    link_or_copy(cached, out_path)
+    return True
+
+
+def negotiate_format(cfg: Config, engine: TTSEngine) -> Optional[AudioFormat]:
+    """Ask ``engine`` for the format that is cheapest to bring to the output.
+
+    ``cfg.engine_format`` is ``auto``, ``default`` (keep the engine's own
+    format) or a codec (``mp3`` or ``pcm``) to choose from. Returns the
+    format the engine now produces, or ``None`` for engines that do not
+    declare their formats.
+    """
+    formats = getattr(engine, "formats", None)
+    if not formats:
+        return None
+    if cfg.engine_format != "default":
+        codec = None if cfg.engine_format == "auto" else cfg.engine_format
+        fmt = choose_format(formats, codec)
+        if fmt is None:
+            raise ValueError(f"{engine.name} cannot return {cfg.engine_format} audio")
+        if fmt != engine.output_format:
+            logger.debug("Requesting %s audio from %s", fmt, engine.name)
+            engine.use_format(fmt)
+    return engine.output_format
+
+
+def _engine_format(engine: TTSEngine) -> Optional[AudioFormat]:
+    return getattr(engine, "output_format", None)
+
+
+def _raw_suffix(engine: TTSEngine) -> str:
+    fmt = _engine_format(engine)
+    return fmt.suffix if fmt else ".mp3"
+
+
+def sound_effect_path(cfg: Config, path: str) -> str:
+    """Resolve a sound effect path; relative paths live in ``cfg.audio_dir``."""
+    if not os.path.isabs(path):
+        path = os.path.join(cfg.audio_dir, path)
+    return path
+
+
+def check_script(cfg: Config, entries: Iterable[EntryLike]) -> int:
+    """Validate a script before anything is synthesized.
+
+    Every entry must parse and every sound effect must exist; all problems
+    are reported together in one :class:`ScriptError`. Speakers without a
+    voice are only logged, since their lines are skipped. Returns the
+    number of entries.
+    """
+    problems: List[str] = []
+    silent_speakers = set()
+    count = 0
+    for idx, data in enumerate(entries):
+        count += 1
+        try:
+            item = parse_entry(data)
+        except ScriptError as e:
+            problems.append(f"entry {idx}: {e}")
             continue
+        if isinstance(item, SoundEffectEntry):
+            se_path = sound_effect_path(cfg, item.path)
+            if not os.path.exists(se_path):
+                problems.append(f"entry {idx}: sound effect {se_path} does not exist")
+        elif isinstance(item, SpeechEntry) and _voice_for(cfg, item) is None:
+            silent_speakers.add(item.speaker)
+    if silent_speakers:
+        logger.warning(
+            "Lines of speakers without a voice are skipped: %s",
+            ", ".join(sorted(silent_speakers)),
+        )
+    if problems:
+        raise ScriptError(
+            f"{len(problems)} invalid script entries:\n" + "\n".join(problems)
+        )
+    return count
+
+
+def prepare_assets(cfg: Config) -> List[str]:
+    """Normalize the configured sound effects ahead of synthesis.
 
-        speaker = item.get("speaker", "0")
-        text = item["text"]
-        if str(speaker) not in cfg.speaker_voice:
+    Returns the normalized paths of the clips that exist.
+    """
+    assets = AssetStore(cfg)
+    prepared = []
+    for name, path in cfg.sound_effects.items():
+        se_path = sound_effect_path(cfg, path)
+        if not os.path.exists(se_path):
+            logger.warning("Sound effect %s (%s) does not exist", name, se_path)
             continue
-        voice = cfg.speaker_voice.get(str(speaker), "alloy")
-        logger.debug("speaker: %s, voice: %s", speaker, voice)
-        out_path = os.path.join(cfg.audio_dir, f"{idx}_{voice}.mp3")
+        prepared.append(assets.normalized(se_path))
+    return prepared
+
+
+def _place_sound_effect(
+    cfg: Config, item: SoundEffectEntry, stem: str, assets: AssetStore
+) -> str:
+    se_path = sound_effect_path(cfg, item.path)
+    if not os.path.exists(se_path):
+        raise FileNotFoundError(f"Sound effect {se_path} does not exist")
+    out_path = os.path.join(cfg.audio_dir, stem + ".mp3")
+    link_or_copy(assets.normalized(se_path), out_path)
+    return out_path
+
+
+async def _stream_segment(
+    engine: TTSEngine, voice: str, text: str, out_path: str
+) -> None:
+    """Write the engine output to ``out_path`` chunk by chunk as it arrives.
+
+    The engine output is kept as-is; it is normalized once complete. Data
+    goes to a ``.part`` file that only replaces ``out_path`` once the
+    response is complete.
+    """
+    logger.debug("Streaming audio file to %s", out_path)
+    part = out_path + ".part"
+    try:
+        with trace.span(
+            "request", "tts", engine=engine.name, chars=len(text)
+        ) as span, open(part, "wb") as af:
+            async for chunk in iter_audio(engine, voice, text):
+                af.write(chunk)
+                span.add("bytes", len(chunk))
+        os.replace(part, out_path)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+
+
+async def _render_entry(
+    cfg: Config,
+    engine: TTSEngine,
+    idx: int,
+    item: ScriptEntry,
+    stem: str,
+    cache: Optional[DiskCache],
+    assets: AssetStore,
+    limiter: AdaptiveLimiter,
+) -> Optional[str]:
+    """Produce the audio file ``<stem>.mp3`` for a single script entry.
+
+    Returns the output path, or ``None`` when the entry is skipped. Blocking
+    file and ffmpeg work runs in the loop's executor so it never stalls the
+    requests in flight.
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(item, SoundEffectEntry):
+        return await loop.run_in_executor(
+            None, _place_sound_effect, cfg, item, stem, assets
+        )
+    if isinstance(item, SilentEntry):
+        out_path = os.path.join(cfg.audio_dir, stem + ".mp3")
+        await loop.run_in_executor(None, generate_silence, out_path, item.duration)
+        return out_path
+
+    voice = _voice_for(cfg, item)
+    if voice is None:
+        return None
+    logger.debug("speaker: %s, voice: %s", item.speaker, voice)
+    base = os.path.join(cfg.audio_dir, stem)
+    suffix = _raw_suffix(engine)
+    raw_path = base + suffix
+    out_key = output_key(cfg, engine, voice, item.text) if cache is not None else None
+    if _reuse_output(cfg, out_key, base + ".mp3"):
+        return base + ".mp3"
 
+    chunks = split_text(item.text, _max_chars(cfg, engine)) or [item.text]
+    if len(chunks) == 1:
         logger.debug("Generating audio for item %d with voice %s", idx, voice)
+        await _request_audio(engine, voice, chunks[0], raw_path, cache, limiter)
+        return await _normalize(cfg, engine, raw_path, base + ".mp3", out_key)
+
+    logger.debug("Generating audio for item %d in %d requests", idx, len(chunks))
+    parts = [f"{base}.chunk{n}{suffix}" for n in range(len(chunks))]
+    try:
+        await asyncio.gather(
+            *[
+                _request_audio(engine, voice, chunk, part, cache, limiter)
+                for chunk, part in zip(chunks, parts)
+            ]
+        )
+        await loop.run_in_executor(None, _stitch, parts, raw_path)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    return await _normalize(cfg, engine, raw_path, base + ".mp3", out_key)
+
+
+async def _normalize(
+    cfg: Config,
+    engine: TTSEngine,
+    raw_path: str,
+    out_path: str,
+    key: Optional[str] = None,
+) -> str:
+    """Bring the engine output at ``raw_path`` to the output profile.
+
+    Runs in the loop's executor while other requests are in flight, so the
+    episode only needs its frames concatenated during assembly. MP3 that is
+    already in the output profile is used as-is. Transcoded audio is also
+    cached under ``key``, so a later hit needs no ffmpeg. Returns
+    ``out_path``.
+    """
+    loop = asyncio.get_running_loop()
+    fmt = _engine_format(engine)
+    store = _output_cache(cfg) if key else None
+    await loop.run_in_executor(
+        None, _normalize_file, get_pool(cfg), fmt, raw_path, out_path, store, key
+    )
+    return out_path
+
+
+def _normalize_file(
+    pool: TranscoderPool,
+    fmt: Optional[AudioFormat],
+    raw_path: str,
+    out_path: str,
+    store: Optional[DiskCache] = None,
+    key: Optional[str] = None,
+) -> None:
+    if fmt is None or fmt.codec != "pcm":
+        with open(raw_path, "rb") as f:
+            data = f.read()
+        if _in_output_profile(data):
+            trace.event("transcode skipped", "ffmpeg")
+            if raw_path != out_path:
+                os.replace(raw_path, out_path)
+            return
+        fmt = None
+    pool.transcode_file(raw_path, out_path, source=fmt)
+    if raw_path != out_path:
+        os.remove(raw_path)
+    if store is not None:
+        store.put_file(key, out_path)
+
+
+def _in_output_profile(data: bytes) -> bool:
+    """Return whether the MP3 ``data`` is in the output profile and bitrate."""
+    if mp3.stream_info(data) != (TARGET_RATE, TARGET_CH):
+        return False
+    return all(mp3.bitrate(data, pos) == BITRATE for pos, _, _, _ in mp3.frames(data))
+
+
+def _voice_for(cfg: Config, item: SpeechEntry) -> Optional[str]:
+    """Return the voice of a speech entry, or ``None`` for unknown speakers."""
+    return cfg.speaker_voice.get(item.speaker)
+
+
+def _max_chars(cfg: Config, engine: TTSEngine) -> int:
+    return cfg.segment_max_chars or getattr(engine, "max_chars", 0)
+
+
+async def _request_audio(
+    engine: TTSEngine,
+    voice: str,
+    text: str,
+    out_path: str,
+    cache: Optional[DiskCache],
+    limiter: AdaptiveLimiter,
+) -> None:
+    """Synthesize one request into ``out_path``, using the segment cache."""
+    key = None
+    if cache is not None:
+        key = segment_key(engine, voice, text)
+        cached = cache.get(key)
+        if cached:
+            logger.debug("Segment cache hit for %s", out_path)
+            trace.event("segment cache hit", "tts")
+            link_or_copy(cached, out_path)
+            return
+
+    # A throttled request is retried from scratch; the partial file is
+    # rewritten.
+    await limiter.call_async(lambda: _stream_segment(engine, voice, text, out_path))
+    if cache is not None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, cache.put_file, key, out_path)
+
+
+def _stitch(parts: List[str], out_path: str) -> None:
+    """Join the engine output files ``parts`` into ``out_path``.
+
+    MP3 is joined frame by frame, raw PCM (``.pcm``) byte by byte.
+    """
+    data = []
+    for part in parts:
+        with open(part, "rb") as f:
+            data.append(f.read())
+    tmp = out_path + ".part"
+    with trace.span("stitch", "file", parts=len(parts)) as span:
+        joined = b"".join(data) if out_path.endswith(".pcm") else mp3.concat(data)
+        with open(tmp, "wb") as f:
+            f.write(joined)
+        os.replace(tmp, out_path)
+        span.set(bytes=len(joined))
 
-        if cfg.tts_engine == "openai":
-            response = client.audio.speech.create(
-                model=cfg.tts_model,
-                voice=voice,
-                input=text,
+
+async def _render_group(
+    cfg: Config,
+    engine: TTSEngine,
+    members: List[Tuple[int, SpeechEntry, str]],
+    cache: Optional[DiskCache],
+    assets: AssetStore,
+    limiter: AdaptiveLimiter,
+) -> Dict[int, object]:
+    """Render adjacent short lines of one speaker with a single request.
+
+    The engine cuts the audio apart at its word timestamps. Lines that are
+    cached are not requested again, and if the engine cannot align the lines
+    each one is rendered on its own. Returns the output path or the
+    exception of every member.
+    """
+    voice = _voice_for(cfg, members[0][1])
+    suffix = _raw_suffix(engine)
+
+    stems = {idx: stem for idx, _, stem in members}
+
+    def path_for(idx: int, suffix: str = ".mp3") -> str:
+        return os.path.join(cfg.audio_dir, stems[idx] + suffix)
+
+    results: Dict[int, object] = {}
+    # Lines whose file still holds the engine's format, with their output
+    # cache key; lines rendered on their own are normalized by
+    # ``_render_entry``.
+    raw: List[Tuple[int, str, Optional[str]]] = []
+    pending = []
+    for idx, item, _ in members:
+        raw_path = path_for(idx, suffix)
+        key = out_key = cached = None
+        if cache is not None:
+            out_key = output_key(cfg, engine, voice, item.text)
+            if _reuse_output(cfg, out_key, path_for(idx)):
+                results[idx] = path_for(idx)
+                continue
+            key = segment_key(engine, voice, item.text)
+            cached = cache.get(key)
+        if cached:
+            link_or_copy(cached, raw_path)
+            raw.append((idx, raw_path, out_key))
+        else:
+            pending.append((idx, item, raw_path, key, out_key))
+
+    pieces = None
+    if len(pending) > 1:
+        texts = [item.text for _, item, _, _, _ in pending]
+        logger.debug("Generating items %s in one request", [p[0] for p in pending])
+        try:
+            with trace.span("batch request", "tts", lines=len(texts)):
+                pieces = await limiter.call_async(
+                    lambda: engine.synthesize_batch(voice, texts)
+                )
+        except Exception as e:
+            logger.warning("Coalesced request failed, retrying lines one by one: %s", e)
+        if pieces is not None and (len(pieces) != len(pending) or not all(pieces)):
+            pieces = None
+
+    if pieces is None:
+        rendered = await asyncio.gather(
+            *[
+                _render_entry(
+                    cfg, engine, idx, item, stems[idx], cache, assets, limiter
+                )
+                for idx, item, _, _, _ in pending
+            ],
+            return_exceptions=True,
+        )
+        results.update(zip((p[0] for p in pending), rendered))
+    else:
+        loop = asyncio.get_running_loop()
+        for (idx, _, raw_path, key, out_key), piece in zip(pending, pieces):
+            with open(raw_path, "wb") as f:
+                f.write(piece)
+            if cache is not None:
+                await loop.run_in_executor(None, cache.put_file, key, raw_path)
+            raw.append((idx, raw_path, out_key))
+
+    normalized = await asyncio.gather(
+        *[
+            _normalize(cfg, engine, path, path_for(idx), out_key)
+            for idx, path, out_key in raw
+        ],
+        return_exceptions=True,
+    )
+    results.update(zip((idx for idx, _, _ in raw), normalized))
+    return results
+
+
+async def _pick(group: "asyncio.Future[Dict[int, object]]", idx: int) -> Optional[str]:
+    result = (await group)[idx]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def entry_id(cfg: Config, engine: TTSEngine, item: ScriptEntry) -> Optional[str]:
+    """Return the content-derived ID of a script entry's audio.
+
+    The ID covers everything the rendered file depends on, so equal entries
+    share one file wherever they appear in the script. Returns ``None`` for
+    speech by a speaker without a voice.
+    """
+    profile = [TARGET_RATE, TARGET_CH, BITRATE]
+    if isinstance(item, SoundEffectEntry):
+        path = sound_effect_path(cfg, item.path)
+        source = file_digest(path) if os.path.exists(path) else path
+        return make_key(type=item.type, source=source, profile=profile)
+    if isinstance(item, SilentEntry):
+        return make_key(type=item.type, duration=item.duration, profile=profile)
+    voice = _voice_for(cfg, item)
+    if voice is None:
+        return None
+    return make_key(
+        engine=engine.name,
+        model=engine.model,
+        voice=voice,
+        text=item.text,
+        settings=engine.settings(),
+        max_chars=_max_chars(cfg, engine),
+        profile=profile,
+    )
+
+
+def _stem(cfg: Config, item: ScriptEntry, segment_id: str) -> str:
+    """Return the file name (without suffix) of an entry's audio."""
+    prefix = _voice_for(cfg, item) if isinstance(item, SpeechEntry) else item.type
+    return f"{prefix}_{segment_id[:16]}"
+
+
+async def _recorded(
+    manifest: SegmentManifest,
+    segment_id: str,
+    idx: int,
+    item: ScriptEntry,
+    render: Awaitable[Optional[str]],
+) -> Optional[str]:
+    """Await ``render`` and add the finished segment to ``manifest``."""
+    path = await render
+    if path:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, manifest.record, segment_id, path, item.to_dict(), idx
+        )
+    return path
+
+
+async def _done(result: Optional[str]) -> Optional[str]:
+    return result
+
+
+def _report(progress: ProgressivePlaylist, idx: int, task: asyncio.Future) -> None:
+    """Report the outcome of the task rendering entry ``idx`` to ``progress``."""
+    if task.cancelled() or task.exception() is not None:
+        progress.fail(idx)
+    else:
+        progress.add(idx, task.result())
+
+
+_END = object()
+
+
+async def _iterate_in_thread(entries: Iterable[EntryLike]) -> AsyncIterator[EntryLike]:
+    """Consume a blocking iterator in a worker thread, yielding its items.
+
+    Used for entries that are still being produced, for example by a
+    streamed script completion.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def produce() -> None:
+        try:
+            for item in entries:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _END)
+
+    producer = loop.run_in_executor(None, produce)
+    while True:
+        item = await queue.get()
+        if item is _END:
+            break
+        if isinstance(item, BaseException):
+            await producer
+            raise item
+        yield item
+    await producer
+
+
+async def _render_script(
+    cfg: Config,
+    entries: Iterable[EntryLike],
+    engine: TTSEngine,
+    progress: Optional[ProgressivePlaylist] = None,
+) -> Tuple[int, Dict[int, str], Dict[int, BaseException]]:
+    """Render ``entries`` concurrently, starting each one as it arrives.
+
+    Entries whose segment is already listed in the audio directory's
+    manifest are not rendered again. Once every entry is done, segments the
+    script no longer uses are removed. Every finished entry is reported to
+    ``progress``. Returns the number of entries together with the rendered
+    paths and the failures, both keyed by script index.
+    """
+    negotiate_format(cfg, engine)
+    cache = open_cache(cfg, "segments", _raw_suffix(engine))
+    assets = AssetStore(cfg)
+    manifest = SegmentManifest(cfg.audio_dir)
+    # Segment ID of every entry, and the task rendering each distinct ID.
+    ids: Dict[int, str] = {}
+    rendering: Dict[str, asyncio.Future] = {}
+    # Entries are rendered concurrently; results are keyed by script index so
+    # that the output order does not depend on completion order. The rate
+    # limiter is shared with every other run in the process.
+    limiter = get_limiter(cfg, "tts", engine.name)
+    tasks: Dict[int, asyncio.Future] = {}
+    loop = asyncio.get_running_loop()
+    published: List[asyncio.Future] = []
+    # Short adjacent lines of one speaker are held back in ``group`` and
+    # rendered with one request when the engine supports it.
+    group: List[Tuple[int, SpeechEntry]] = []
+    coalesce = cfg.coalesce_chars > 0 and hasattr(engine, "synthesize_batch")
+    max_chars = _max_chars(cfg, engine)
+
+    def is_short(item: ScriptEntry) -> bool:
+        return (
+            isinstance(item, SpeechEntry)
+            and _voice_for(cfg, item) is not None
+            and len(item.text) <= cfg.coalesce_chars
+        )
+
+    def track(idx: int, task: asyncio.Future) -> None:
+        tasks[idx] = task
+        if progress is not None:
+            task.add_done_callback(
+                lambda t: published.append(
+                    loop.run_in_executor(None, _report, progress, idx, t)
+                )
             )
-            audio_data = response.content
-        elif cfg.tts_engine == "volcengine":
-            logger.debug("VOLCENGINE_APP_ID: %s", cfg_module.VOLCENGINE_APP_ID)
-            logger.debug("VOLCENGINE_TOKEN: %s", cfg_module.VOLCENGINE_TOKEN)
-            logger.debug("tts_model: %s", cfg.tts_model)
-
-            payload = {
-                "app": {
-                    "appid": cfg_module.VOLCENGINE_APP_ID,
-                    "token": cfg_module.VOLCENGINE_TOKEN,
-                    "cluster": cfg.tts_model,
-                },
-                "user": {"uid": "text2cast"},
-                "audio": {
-                    "voice_type": voice,
-                    "encoding": "mp3",
-                    "rate": 24000,
-                    "speed_ratio": 1.0,
-                },
-                # "resource_id": "volc.tts_async.emotion",
-                "request": {
-                    "reqid": str(uuid.uuid4()),
-                    "text": text,
-                    "text_type": "plain",
-                    "operation": "query",
-                    "sequence": 1,
-                },
-            }
-            headers = {"Authorization": f"Bearer;{cfg_module.VOLCENGINE_TOKEN}"}
-            resp = requests.post(
-                "https://openspeech.bytedance.com/api/v1/tts",
-                json=payload,
-                headers=headers,
-                timeout=30,
+
+    def submit(idx: int, item: ScriptEntry, render: Awaitable[Optional[str]]) -> None:
+        task = asyncio.ensure_future(_recorded(manifest, ids[idx], idx, item, render))
+        rendering[ids[idx]] = task
+        track(idx, task)
+
+    def flush() -> None:
+        if len(group) > 1:
+            members = [(idx, item, _stem(cfg, item, ids[idx])) for idx, item in group]
+            batch = asyncio.ensure_future(
+                _render_group(cfg, engine, members, cache, assets, limiter)
+            )
+            for idx, item in group:
+                submit(idx, item, _pick(batch, idx))
+        elif group:
+            idx, item = group[0]
+            stem = _stem(cfg, item, ids[idx])
+            submit(
+                idx,
+                item,
+                _render_entry(cfg, engine, idx, item, stem, cache, assets, limiter),
             )
+        group.clear()
 
-            resp.raise_for_status()
-            data = resp.json()
+    def start(data: EntryLike) -> None:
+        item = parse_entry(data)
+        idx = len(tasks) + len(group)
+        segment_id = entry_id(cfg, engine, item)
+        if segment_id is None:
+            logger.debug("Skipping item %d of a speaker without a voice", idx)
+            track(idx, asyncio.ensure_future(_done(None)))
+            return
+        ids[idx] = segment_id
+        # Equal entries share the file; only the first one is rendered.
+        if any(ids[i] == segment_id for i, _ in group):
+            flush()
+        if segment_id in rendering:
+            track(idx, rendering[segment_id])
+            return
+        finished = manifest.lookup(segment_id)
+        if finished:
+            logger.debug("Item %d is already rendered as %s", idx, finished)
+            trace.event("segment resumed", "tts")
+            rendering[segment_id] = asyncio.ensure_future(_done(finished))
+            track(idx, rendering[segment_id])
+            return
+        if coalesce and is_short(item):
+            if group and (
+                group[0][1].speaker != item.speaker
+                or not can_coalesce(
+                    [i.text for _, i in group],
+                    item.text,
+                    cfg.coalesce_chars,
+                    max_chars,
+                )
+            ):
+                flush()
+            group.append((idx, item))
+            return
+        flush()
+        stem = _stem(cfg, item, segment_id)
+        submit(
+            idx,
+            item,
+            _render_entry(cfg, engine, idx, item, stem, cache, assets, limiter),
+        )
 
-            logger.debug("data.get('code'): %s", data.get("code"))
+    source_error: Optional[BaseException] = None
+    if isinstance(entries, (list, tuple)):
+        for item in entries:
+            start(item)
+    else:
+        try:
+            async for item in _iterate_in_thread(entries):
+                start(item)
+        except Exception as e:
+            source_error = e
+    flush()
+    try:
+        results = await asyncio.gather(
+            *[tasks[idx] for idx in sorted(tasks)], return_exceptions=True
+        )
+        if source_error is not None:
+            # Entries that were already started are finished (and cached) first.
+            raise source_error
+        manifest.prune(ids.values())
+    finally:
+        manifest.save()
+        # The done callbacks of the tasks ran before ``gather`` returned, so
+        # every entry has been handed to the playlist.
+        for error in await asyncio.gather(*published, return_exceptions=True):
+            if isinstance(error, BaseException):
+                logger.warning("Progressive output failed: %s", error)
+    rendered: Dict[int, str] = {}
+    failures: Dict[int, BaseException] = {}
+    for idx, result in enumerate(results):
+        if isinstance(result, BaseException):
+            logger.error("Failed to render item %d: %s", idx, result)
+            failures[idx] = result
+        elif result:
+            rendered[idx] = result
+    return len(tasks), rendered, failures
 
-            # if data.get("code") != 0:
-            #     raise RuntimeError(data)
-            payload_data = data.get("data")
-            if isinstance(payload_data, dict):
-                payload_data = payload_data.get("audio")
-            audio_data = base64.b64decode(payload_data)
-        else:
-            logger.debug("MINIMAX_GROUP_ID: %s", cfg_module.MINIMAX_GROUP_ID)
-            logger.debug("tts_model: %s", cfg.tts_model)
-
-            payload = {
-                "model": cfg.tts_model,
-                "text": text,
-                "timber_weights": [{"voice_id": voice, "weight": 1}],
-                "voice_setting": {
-                    "voice_id": voice,
-                    "speed": 1.2,
-                    "pitch": 0,
-                    "vol": 1,
-                    "latex_read": False,
-                },
-                "audio_setting": {
-                    "sample_rate": 32000,
-                    "bitrate": 128000,
-                    "format": "mp3",
-                },
-                "language_boost": "auto",
-            }
-            url = (
-                f"https://api.minimax.chat/v1/t2a_v2?GroupId="
-                f"{cfg_module.MINIMAX_GROUP_ID}"
+
+def _channel_layout() -> str:
+    return "mono" if TARGET_CH == 1 else "stereo"
+
+
+def _concat_files(inputs: List[str], output_path: str) -> bool:
+    """Join ``inputs`` frame by frame if all of them match the output profile.
+
+    The inputs may differ in bitrate (segments rendered by an earlier run can
+    keep the engine's own), so the file starts with an info frame
+    carrying the exact length. Returns ``False`` (writing nothing) as soon
+    as an input does not match.
+    """
+    tmp_path = output_path + ".part"
+    placeholder = mp3.info_frame(TARGET_RATE, TARGET_CH, BITRATE, 0, 0, False)
+    count = 0
+    bitrates = set()
+    try:
+        with trace.span("concat", "file", inputs=len(inputs)) as span, open(
+            tmp_path, "wb"
+        ) as out:
+            out.write(placeholder)
+            for path in inputs:
+                with open(path, "rb") as f:
+                    data = f.read()
+                if mp3.stream_info(data) != (TARGET_RATE, TARGET_CH):
+                    logger.debug("%s is not in the output profile", path)
+                    return False
+                for pos, length, _, _ in mp3.frames(data):
+                    out.write(data[pos:pos + length])
+                    bitrates.add(mp3.bitrate(data, pos))
+                    count += 1
+            size = out.tell()
+            out.seek(0)
+            out.write(
+                mp3.info_frame(
+                    TARGET_RATE, TARGET_CH, BITRATE, count, size, len(bitrates) > 1
+                )
             )
-            headers = {"Authorization": f"Bearer {cfg_module.MINIMAX_API_KEY}"}
-
-            delay = 1
-            for _ in range(5):
-                resp = requests.post(url, headers=headers, json=payload, timeout=60)
-                resp.raise_for_status()
-                data = resp.json()
-                if data.get("base_resp", {}).get("status_code") == 1002:
-                    logger.warning(
-                        "Rate limit encountered, sleeping for %s seconds", delay
-                    )
-                    time.sleep(delay)
-                    delay = min(delay * 2, 60)
-                    continue
-                break
-            if data.get("base_resp", {}).get("status_code") != 0:
-                raise RuntimeError(data)
-            audio_data = bytes.fromhex(data["data"]["audio"])
-
-        logger.debug("Writing audio file to %s", out_path)
-        tmp = out_path + ".raw"
-        with open(tmp, "wb") as af:
-            af.write(audio_data)
-        convert_audio(tmp, out_path)
-        audio_files.append(out_path)
+            span.set(bytes=size)
+        os.replace(tmp_path, output_path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def assemble_audio(inputs: List[str], output_path: str) -> None:
+    """Concatenate ``inputs`` into ``output_path``.
+
+    Speech, silence and sound effects are normally already in the output
+    profile, so their frames are joined without ffmpeg. Otherwise every
+    input is decoded and resampled inside one ffmpeg filter graph, so the
+    episode is encoded exactly once.
+    """
+    if not inputs:
+        raise RuntimeError("No audio segments to assemble")
+    if _concat_files(inputs, output_path):
+        return
+    # Inputs that are the same file on disk (for example hardlinked sound
+    # effects) are decoded once and fanned out with asplit.
+    sources: List[str] = []
+    uses: Dict[int, List[int]] = {}
+    identities: Dict[tuple, int] = {}
+    for pos, path in enumerate(inputs):
+        st = os.stat(path)
+        ident = (st.st_dev, st.st_ino)
+        if ident not in identities:
+            identities[ident] = len(sources)
+            sources.append(path)
+        uses.setdefault(identities[ident], []).append(pos)
+
+    cmd = ["ffmpeg", "-y"]
+    for path in sources:
+        cmd += ["-i", path]
+    layout = _channel_layout()
+    chains = []
+    for src_idx, positions in uses.items():
+        chain = (
+            f"[{src_idx}:a]aresample={TARGET_RATE},"
+            f"aformat=sample_fmts=fltp:channel_layouts={layout}"
+        )
+        if len(positions) > 1:
+            chain += f",asplit={len(positions)}"
+        chains.append(chain + "".join(f"[a{pos}]" for pos in positions))
+    labels = "".join(f"[a{pos}]" for pos in range(len(inputs)))
+    graph = ";".join(chains + [f"{labels}concat=n={len(inputs)}:v=0:a=1[out]"])
+    # Encode to a temporary name so a failed run never leaves a truncated
+    # episode behind.
+    tmp_path = output_path + ".part"
+    cmd += [
+        "-filter_complex",
+        graph,
+        "-map",
+        "[out]",
+        "-ar",
+        str(TARGET_RATE),
+        "-ac",
+        str(TARGET_CH),
+        "-b:a",
+        f"{BITRATE}k",
+        "-f",
+        "mp3",
+        tmp_path,
+    ]
+    with trace.span("assemble", "ffmpeg", inputs=len(inputs)) as span:
+        subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+        os.replace(tmp_path, output_path)
+        span.set(bytes=os.path.getsize(output_path))
+
+
+def script_to_audio(
+    cfg: Config,
+    engine: Optional[TTSEngine] = None,
+    entries: Optional[Iterable[dict]] = None,
+    strict: bool = False,
+) -> list:
+    """Synthesize the script at ``cfg.script_path`` into ``cfg.audio_dir``.
+
+    ``engine`` may be passed to reuse an engine (and its connection pool)
+    across runs; otherwise one is created for this run and closed afterwards.
+    ``entries`` replaces reading the script file; it may be any iterable of
+    entries or their dicts, including a generator that is still producing
+    entries, and synthesis of each entry starts as soon as it is yielded.
+    The script file and lists of entries are checked with
+    :func:`check_script` before the first request. A JSONL script is read
+    entry by entry instead of being loaded whole. With ``cfg.progressive``
+    the episode is also published as an HLS playlist in
+    ``<audio_dir>/live`` that grows while entries finish. With ``strict`` a
+    ``RuntimeError`` is raised after assembly if any entry failed.
+    """
+    if entries is None:
+        logger.debug("Reading script from %s", cfg.script_path)
+        if is_jsonl(cfg.script_path):
+            check_script(cfg, iter_script(cfg.script_path))
+            entries = iter_script(cfg.script_path)
+        else:
+            entries = load_script(cfg.script_path)
+    if isinstance(entries, (list, tuple)):
+        check_script(cfg, entries)
+
+    logger.debug("Ensuring audio directory %s exists", cfg.audio_dir)
+    os.makedirs(cfg.audio_dir, exist_ok=True)
+
+    owns_engine = engine is None
+    if owns_engine:
+        engine = create_engine(cfg)
+
+    logger.debug("speaker_voice: %s", cfg.speaker_voice)
+
+    progress = None
+    if cfg.progressive:
+        progress = ProgressivePlaylist(
+            os.path.join(cfg.audio_dir, PROGRESSIVE_DIR), cfg.progressive_chunk_seconds
+        )
+        logger.info("Publishing the episode progressively to %s", progress.path)
+
+    try:
+        count, rendered, failures = runtime.run(
+            _render_script(cfg, entries, engine, progress)
+        )
+    finally:
+        if progress is not None:
+            progress.close()
+        if owns_engine:
+            runtime.run(engine.aclose())
+
+    if failures:
+        logger.error(
+            "%d of %d entries failed: %s",
+            len(failures),
+            count,
+            ", ".join(str(i) for i in sorted(failures)),
+        )
+
+    audio_files = [rendered[idx] for idx in sorted(rendered)]
 
     # Concatenate individual audio files into one
     combined_path = os.path.join(cfg.audio_dir, "combined.mp3")
     logger.debug(
-        "Concatenating %d audio files into %s", len(audio_files), combined_path
+        "Assembling %d audio files into %s", len(audio_files), combined_path
     )
-    with open(combined_path, "wb") as outfile:
-        for path in audio_files:
-            with open(path, "rb") as infile:
-                outfile.write(infile.read())
+    assemble_audio(audio_files, combined_path)
+
+    if strict and failures:
+        raise RuntimeError(f"{len(failures)} of {count} script entries failed")
 
     audio_files.append(combined_path)
     return audio_files
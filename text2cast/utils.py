@@ -1,5 +1,7 @@
 import re
+import json
 import logging
+from typing import Iterable, Iterator, List
 
 logger = logging.getLogger(__name__)
 
@@ -20,3 +22,91 @@ def wash_json(text: str) -> str:
 
     logger.debug("Washed text: %s", text)
     return text.strip()
+
+
+def _array_text(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield ``chunks`` from the opening ``[`` of the JSON array on.
+
+    Text starting with ``[`` or a code fence is passed on as it arrives.
+    After leading prose the array is taken from the first code fence, as
+    :func:`wash_json` does; without a fence the whole text is buffered and
+    the first ``[`` is used.
+    """
+    chunks = iter(chunks)
+    head = ""
+    for chunk in chunks:
+        head += chunk
+        text = head.lstrip()
+        if text.startswith("["):
+            yield text
+            break
+        fence = text.find("```")
+        if fence < 0:
+            continue
+        start = text.find("[", fence)
+        if start >= 0:
+            yield text[start:]
+            break
+    else:
+        start = head.find("[")
+        if start >= 0:
+            yield head[start:]
+        return
+    # Not ``yield from``: closing this generator must not close ``chunks``,
+    # which the caller may still read to the end.
+    for chunk in chunks:
+        yield chunk
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[dict]:
+    """Yield the objects of a JSON array while its text is still arriving.
+
+    ``chunks`` is any iterable of text fragments, for example the deltas of
+    a streamed chat completion. Anything before the array (such as prose and
+    a Markdown code fence) is skipped and parsing stops at the closing ``]``;
+    the rest of ``chunks`` is left unread.
+    Each top-level object is decoded as soon as its closing brace arrives.
+    Raises ``ValueError`` if the text ends before the closing ``]``, so a
+    truncated array is never taken for a complete one.
+    """
+    started = False
+    depth = 0
+    in_string = False
+    escaped = False
+    buf: List[str] = []
+    for chunk in _array_text(chunks):
+        for ch in chunk:
+            if not started:
+                if ch == "[":
+                    started = True
+                    depth = 1
+                continue
+            if depth == 1:
+                if ch == "{":
+                    depth = 2
+                    buf = [ch]
+                elif ch == "]":
+                    return
+                continue
+            buf.append(ch)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                depth += 1
+            elif ch in "}]":
+                depth -= 1
+                if depth == 1:
+                    yield json.loads("".join(buf))
+                    buf = []
+    if not started:
+        raise ValueError("The text holds no JSON array")
+    if depth > 1:
+        raise ValueError("The JSON array ends in the middle of an element")
+    raise ValueError("The JSON array ends before its closing bracket")
@@ -1,97 +1,321 @@
+"""Voice cloning with Volcengine's MegaTTS service.
+
+Samples are trimmed, downmixed and resampled with ffmpeg before they are
+uploaded, one process per sample running concurrently. The upload body is
+streamed: every sample is base64-encoded block by block while the request is
+sent, so memory use does not grow with the samples. Several voices are
+cloned in one call, and :func:`wait_for_voices` polls the training status
+with backoff until the voices can be used.
+"""
+
 import base64
-import os
-import requests
-import logging
 import json
-from typing import List, Dict
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
 
 from . import config as cfg_module
 from .config import load_env_vars
+from . import trace
 
 logger = logging.getLogger(__name__)
 
+MEGATTS_URL = "https://openspeech.bytedance.com/api/v1/mega_tts"
+# Formats accepted by the upload endpoint.
+UPLOAD_FORMATS = ("wav", "mp3", "ogg", "m4a", "aac", "pcm")
+SAMPLE_RATE = 24000  # Hz, the rate the cloned voices are synthesized at
+SAMPLE_BITRATE = 128  # kbps
+# Training states reported by ``mega_tts/status``.
+STATUS_NAMES = {0: "not found", 1: "training", 2: "ready", 3: "failed", 4: "active"}
+READY = (2, 4)
+FAILED = (0, 3)
 
-def _encode_audio_file(path: str) -> Dict[str, str]:
-    """Return base64 encoded audio and format for a given file."""
-    with open(path, "rb") as af:
-        data = base64.b64encode(af.read()).decode("utf-8")
-    fmt = os.path.splitext(path)[1].lstrip(".")
-    return {"audio_bytes": data, "audio_format": fmt}
+_TRIM = "silenceremove=start_periods=1:start_threshold=-50dB:start_silence=0.1"
+# A multiple of 3, so the base64 of consecutive blocks joins without padding.
+_BLOCK = 3 * 65536
 
 
-def clone_voice(samples: List[str], voice_name: str) -> str:
-    """Create a custom voice with Volcengine's voice cloning service.
+def _format(path: str) -> str:
+    return os.path.splitext(path)[1].lstrip(".").lower()
 
-    Parameters
-    ----------
-    samples : list of str
-        Paths to audio sample files used for cloning.
-    voice_name : str
-        Name for the new cloned voice.
 
-    Returns
-    -------
-    str
-        The voice_id returned by the service.
+def preprocess_sample(path: str, out_path: str) -> str:
+    """Trim silence from both ends of ``path``, downmix and resample it.
+
+    The result is a mono MP3 at ``SAMPLE_RATE`` written to ``out_path``.
+    Returns the path to upload: ``out_path``, or ``path`` itself if it is
+    already smaller and in an accepted format.
     """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Sample {path} does not exist")
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        path,
+        # Trailing silence is trimmed by trimming the start of the reversed audio.
+        "-af",
+        f"{_TRIM},areverse,{_TRIM},areverse",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-b:a",
+        f"{SAMPLE_BITRATE}k",
+        "-f",
+        "mp3",
+        out_path,
+    ]
+    with trace.span("preprocess sample", "ffmpeg") as span:
+        subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+        span.set(bytes=os.path.getsize(out_path))
+    original, reduced = os.path.getsize(path), os.path.getsize(out_path)
+    logger.debug("Preprocessed %s: %d -> %d bytes", path, original, reduced)
+    if _format(path) in UPLOAD_FORMATS and original <= reduced:
+        return path
+    return out_path
+
+
+def _upload_body(meta: dict, samples: List[str]) -> Tuple[int, Iterator[bytes]]:
+    """Return the length and the chunks of the JSON upload body.
+
+    ``meta`` holds every field besides ``audios``. The samples are read and
+    base64-encoded only while the chunks are consumed.
+    """
+    pieces: List[object] = [json.dumps(meta)[:-1].encode() + b', "audios": [']
+    for n, path in enumerate(samples):
+        head = json.dumps({"audio_format": _format(path)})[:-1]
+        separator = ", " if n else ""
+        pieces.append(f'{separator}{head}, "audio_bytes": "'.encode())
+        pieces.append(path)
+        pieces.append(b'"}')
+    pieces.append(b"]}")
+    length = sum(
+        len(p) if isinstance(p, bytes) else 4 * -(-os.path.getsize(p) // 3)
+        for p in pieces
+    )
+
+    def chunks() -> Iterator[bytes]:
+        for piece in pieces:
+            if isinstance(piece, bytes):
+                yield piece
+                continue
+            with open(piece, "rb") as f:
+                for block in iter(lambda: f.read(_BLOCK), b""):
+                    yield base64.b64encode(block)
+
+    return length, chunks()
+
+
+def _credentials() -> Tuple[str, str]:
     load_env_vars()
     token = cfg_module.VOLCENGINE_TOKEN
     appid = cfg_module.VOLCENGINE_APP_ID
-
-    logger.info("VOLCENGINE_TOKEN: %s", token)
-    logger.info("VOLCENGINE_APP_ID: %s", appid) 
-
     if not token or not appid:
         raise ValueError("VOLCENGINE_TOKEN or VOLCENGINE_APP_ID not set")
+    return token, appid
+
 
-    headers = {
+def _headers(token: str) -> Dict[str, str]:
+    return {
         "Content-Type": "application/json",
         "Authorization": f"Bearer;{token}",
         "Resource-Id": "volc.megatts.voiceclone",
     }
 
-    audios = [_encode_audio_file(p) for p in samples]
-    payload = {
+
+def _url(path: str) -> str:
+    return (cfg_module.VOLCENGINE_CLONE_URL or MEGATTS_URL).rstrip("/") + path
+
+
+def _check(resp: httpx.Response) -> dict:
+    """Return the response document, raising for HTTP and service errors."""
+    logger.debug("resp: %s", resp.text[:500])
+    resp.raise_for_status()
+    data = resp.json()
+    base = data.get("BaseResp") or {}
+    if base.get("StatusCode", 0) != 0:
+        raise RuntimeError(f"{base.get('StatusCode')}: {base.get('StatusMessage')}")
+    return data
+
+
+def upload_voice(client: httpx.Client, voice_name: str, samples: List[str]) -> dict:
+    """Upload ``samples`` to train the voice ``voice_name``."""
+    token, appid = _credentials()
+    meta = {
         "appid": appid,
         "speaker_id": voice_name,
-        "audios": audios,
         "source": 2,
         "language": 0,
         "model_type": 1,
     }
-
-    logger.debug("Uploading %d samples for voice %s", len(samples), voice_name)
-    resp = requests.post(
-        "https://openspeech.bytedance.com/api/v1/mega_tts/audio/upload",
-        json=payload,
-        headers=headers,
-        timeout=60,
+    length, body = _upload_body(meta, samples)
+    logger.debug(
+        "Uploading %d samples (%d bytes) for voice %s", len(samples), length, voice_name
     )
-    resp.raise_for_status()
-    logger.debug("Clone response: %s", resp.json())
+    headers = {**_headers(token), "Content-Length": str(length)}
+    with trace.span("upload voice", "http", voice=voice_name, bytes=length):
+        resp = client.post(_url("/audio/upload"), content=body, headers=headers)
+    data = _check(resp)
+    logger.debug("Clone response: %s", data)
+    return data
+
+
+def clone_voices(
+    voices: Dict[str, List[str]],
+    preprocess: bool = True,
+    wait: bool = False,
+    timeout: float = 600.0,
+    workers: Optional[int] = None,
+) -> Dict[str, dict]:
+    """Clone every voice in ``voices`` (name to sample paths).
+
+    All samples are preprocessed at the same time (at most ``workers``
+    ffmpeg processes, by default one per CPU), and each voice is uploaded as
+    soon as its own samples are ready. With ``wait`` the training status is
+    polled until every uploaded voice is ready or failed, or ``timeout``
+    seconds passed.
+
+    Returns the last status document of every voice; voices whose
+    preprocessing or upload failed map to ``{"error": message}``.
+    """
+    _credentials()
+    results: Dict[str, dict] = {}
+    with ExitStack() as stack:
+        tmp = stack.enter_context(tempfile.TemporaryDirectory(prefix="text2cast-"))
+        ffmpeg = stack.enter_context(
+            ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        )
+        uploads = stack.enter_context(
+            ThreadPoolExecutor(max_workers=max(1, min(len(voices), 4)))
+        )
+        client = stack.enter_context(httpx.Client(timeout=120))
+        # A sample shared by several voices is preprocessed once.
+        prepared: Dict[str, Future] = {}
+        if preprocess:
+            for path in dict.fromkeys(p for samples in voices.values() for p in samples):
+                out_path = os.path.join(tmp, f"{len(prepared)}.mp3")
+                prepared[path] = ffmpeg.submit(preprocess_sample, path, out_path)
+
+        def upload(name: str) -> dict:
+            samples = voices[name]
+            if preprocess:
+                samples = [prepared[path].result() for path in samples]
+            return upload_voice(client, name, samples)
+
+        futures = {name: uploads.submit(upload, name) for name in voices}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error("Cloning voice %s failed: %s", name, e)
+                results[name] = {"error": str(e)}
+            else:
+                logger.info("Uploaded samples for voice %s", name)
+
+        uploaded = [name for name, result in results.items() if "error" not in result]
+        if wait and uploaded:
+            results.update(wait_for_voices(uploaded, timeout, client=client))
+    return results
+
+
+def clone_voice(samples: List[str], voice_name: str, preprocess: bool = True) -> str:
+    """Create a custom voice with Volcengine's voice cloning service.
+
+    Parameters
+    ----------
+    samples : list of str
+        Paths to audio sample files used for cloning.
+    voice_name : str
+        Name for the new cloned voice.
+    preprocess : bool
+        Trim, downmix and resample the samples before uploading them.
+
+    Returns
+    -------
+    str
+        The voice_id returned by the service.
+    """
+    result = clone_voices({voice_name: samples}, preprocess=preprocess)[voice_name]
+    if "error" in result:
+        raise RuntimeError(f"Cloning voice {voice_name} failed: {result['error']}")
     return voice_name
 
 
-def get_clone_status(voice_name: str) -> dict:
+def get_clone_status(voice_name: str, client: Optional[httpx.Client] = None) -> dict:
     """Fetch cloning status for a voice."""
-    load_env_vars()
-    token = cfg_module.VOLCENGINE_TOKEN
-    appid = cfg_module.VOLCENGINE_APP_ID
-    if not token or not appid:
-        raise ValueError("VOLCENGINE_TOKEN or VOLCENGINE_APP_ID not set")
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer;{token}",
-        "Resource-Id": "volc.megatts.voiceclone",
-    }
+    token, appid = _credentials()
     body = {"appid": appid, "speaker_id": voice_name}
-    resp = requests.post(
-        "https://openspeech.bytedance.com/api/v1/mega_tts/status",
-        headers=headers,
-        json=body,
-        timeout=60,
-    )
-    logger.debug("resp: %s", resp.text)
-    resp.raise_for_status()
-    return resp.json()
+    if client is None:
+        with httpx.Client(timeout=60) as own:
+            return get_clone_status(voice_name, own)
+    resp = client.post(_url("/status"), headers=_headers(token), json=body)
+    return _check(resp)
+
+
+def status_name(status: dict) -> str:
+    """Return a readable training state for a status document."""
+    if "error" in status:
+        return "error"
+    return STATUS_NAMES.get(status.get("status"), str(status.get("status")))
+
+
+def wait_for_voices(
+    voice_names: Iterable[str],
+    timeout: float = 600.0,
+    interval: float = 2.0,
+    max_interval: float = 30.0,
+    client: Optional[httpx.Client] = None,
+) -> Dict[str, dict]:
+    """Poll the training status of ``voice_names`` until each is done.
+
+    The pause between polls doubles from ``interval`` up to
+    ``max_interval``. A poll that fails (network or service error) is logged
+    and retried with the same backoff, so only a terminal state or the
+    deadline ends the wait for a voice. Returns the last status document of
+    every voice; voices still training after ``timeout`` seconds are logged
+    and returned as they are, and voices whose status could never be read
+    map to ``{"error": message}``.
+    """
+    if client is None:
+        with httpx.Client(timeout=60) as own:
+            return wait_for_voices(voice_names, timeout, interval, max_interval, own)
+    pending = list(voice_names)
+    statuses: Dict[str, dict] = {}
+    deadline = time.monotonic() + timeout
+    delay = interval
+    while True:
+        with trace.span("poll clone status", "http", voices=len(pending)):
+            for name in pending:
+                try:
+                    statuses[name] = get_clone_status(name, client)
+                except (httpx.HTTPError, RuntimeError, ValueError) as e:
+                    logger.warning("Polling the status of voice %s failed: %s", name, e)
+                    if "status" not in statuses.get(name, {}):
+                        statuses[name] = {"error": str(e)}
+        for name in list(pending):
+            state = statuses[name].get("status")
+            if state in READY or state in FAILED:
+                log = logger.info if state in READY else logger.error
+                log("Voice %s is %s", name, status_name(statuses[name]))
+                pending.remove(name)
+        if not pending:
+            return statuses
+        if time.monotonic() + delay > deadline:
+            logger.warning(
+                "Voices still training after %.0fs: %s", timeout, ", ".join(pending)
+            )
+            return statuses
+        logger.debug("Waiting %.1fs for %s", delay, ", ".join(pending))
+        time.sleep(delay)
+        delay = min(delay * 2, max_interval)